@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+In-process fake of the Gemini batch API calls used by gembatch
+
+FakeGemini provides client.files (upload, download, list, delete) and
+client.batches (create, get, list, delete) with configurable latency,
+injected errors and job completion times. Inline requests are answered
+with inline responses. Uploaded inputs stay on local disk, and results
+are generated from them line by line while they are downloaded, so
+inputs and results of several gigabytes need no memory.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+PAGE_SIZE = 100  # Default page size of list calls, as in the API
+READ_CHUNK = 1024 * 1024  # Bytes read at once while "uploading" a file
+
+
+class FakeAPIError(Exception):
+    """Error with an HTTP status code, like google.genai.errors.APIError"""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakePager:
+    """Minimal pager with the page/config/next_page interface of the SDK"""
+
+    def __init__(self, fetch, page_size):
+        self._fetch = fetch
+        self.config = {"page_size": page_size}
+        self.page = []
+        self._load(0)
+
+    def _load(self, offset):
+        self.page, next_offset = self._fetch(offset, self.config["page_size"])
+        self.config["page_token"] = next_offset
+
+    def next_page(self):
+        if not self.config.get("page_token"):
+            raise IndexError("No more pages to fetch.")
+        self._load(self.config["page_token"])
+        return self.page
+
+    def __iter__(self):
+        while True:
+            yield from self.page
+            if not self.config.get("page_token"):
+                return
+            self.next_page()
+
+
+class FakeGemini:
+    """Fake client whose jobs complete completion_time seconds after creation
+
+    latency is the delay of every call in seconds, or a dict of delays per
+    endpoint (upload, create, get, list, download, delete). A fraction
+    error_rate of calls fails with 429 or 503 before doing any work, and a
+    fraction failure_rate of jobs ends in JOB_STATE_FAILED. Each result line
+    carries about response_bytes of generated text.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, completion_time=1.0, completion_jitter=0.5,
+                 failure_rate=0.0, response_bytes=100, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.completion_time = completion_time
+        self.completion_jitter = completion_jitter
+        self.failure_rate = failure_rate
+        self.response_bytes = response_bytes
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()  # endpoint -> calls, including failed ones
+        self.uploads = {}  # file name -> {"path", "size", "create_time"}
+        self.results = {}  # result file name -> input path
+        self.jobs = {}  # batch name -> job state
+        self.next_id = 0
+        self.files = SimpleNamespace(upload=self._upload, download=self._download,
+                                     list=self._list_files, delete=self._delete_file)
+        self.batches = SimpleNamespace(create=self._create, get=self._get,
+                                       list=self._list_batches, delete=self._delete_batch)
+
+    def _call(self, endpoint):
+        """Count a call, wait its latency and fail it at the configured rate"""
+        with self.lock:
+            self.calls[endpoint] += 1
+            fail = self.random.random() < self.error_rate
+            code = self.random.choice([429, 503])
+        latency = self.latency.get(endpoint, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            time.sleep(latency)
+        if fail:
+            raise FakeAPIError(code, "injected error")
+
+    def _new_name(self, prefix):
+        with self.lock:
+            self.next_id += 1
+            return f"{prefix}/fake-{self.next_id:08d}"
+
+    # files
+
+    def _upload(self, file, config=None):
+        self._call("upload")
+        size = 0
+        with open(file, "rb") as f:
+            while chunk := f.read(READ_CHUNK):
+                size += len(chunk)
+        name = self._new_name("files")
+        with self.lock:
+            self.uploads[name] = {"path": str(file), "size": size, "create_time": datetime.now(timezone.utc)}
+        return SimpleNamespace(name=name, size_bytes=size, create_time=self.uploads[name]["create_time"])
+
+    def _download(self, file, destination=None):
+        self._call("download")
+        with self.lock:
+            path = self.results.get(file)
+        if path is None:
+            raise FakeAPIError(404, f"File not found: {file}")
+        padding = "x" * self.response_bytes
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                key = json.loads(line).get("key")
+                result = {"key": key, "response": {"candidates": [{"content": {"parts": [{"text": padding}],
+                                                                              "role": "model"}}]}}
+                destination.write((json.dumps(result) + "\n").encode("utf-8"))
+
+    def _list_files(self, config=None):
+        self._call("list")
+        def fetch(offset, size):
+            with self.lock:
+                names = sorted(self.uploads)
+                page = [SimpleNamespace(name=name, create_time=self.uploads[name]["create_time"])
+                        for name in names[offset:offset + size]]
+            return page, offset + size if offset + size < len(names) else None
+        return FakePager(fetch, (config or {}).get("page_size", PAGE_SIZE))
+
+    def _delete_file(self, name):
+        self._call("delete")
+        with self.lock:
+            if self.uploads.pop(name, None) is None and self.results.pop(name, None) is None:
+                raise FakeAPIError(404, f"File not found: {name}")
+
+    # batches
+
+    def _create(self, model, src, config=None):
+        self._call("create")
+        inline = isinstance(src, list)
+        with self.lock:
+            upload = None if inline else self.uploads.get(src)
+        if not inline and upload is None:
+            raise FakeAPIError(400, f"Unknown source file: {src}")
+        name = self._new_name("batches")
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            duration = max(0.0, self.completion_time + self.random.uniform(-1, 1) * self.completion_jitter)
+            self.jobs[name] = {
+                "display_name": (config or {}).get("display_name", name),
+                "model": model,
+                "src": None if inline else src,
+                "path": None if inline else upload["path"],
+                "inline": len(src) if inline else None,
+                "create_time": now,
+                "duration": duration,
+                "failed": self.random.random() < self.failure_rate,
+            }
+        # Like the API, a new job is always reported as pending
+        return self._batch(name, created=True)
+
+    def _batch(self, name, created=False):
+        """Batch object reflecting the job's state at the current time, or None"""
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                return None
+            elapsed = -1.0 if created else (datetime.now(timezone.utc) - job["create_time"]).total_seconds()
+            end_time = update_time = None
+            dest = None
+            if elapsed >= job["duration"]:
+                state = "JOB_STATE_FAILED" if job["failed"] else "JOB_STATE_SUCCEEDED"
+                end_time = update_time = datetime.fromtimestamp(job["create_time"].timestamp() + job["duration"],
+                                                                timezone.utc)
+                if not job["failed"] and job["inline"] is not None:
+                    dest = SimpleNamespace(file_name=None, inlined_responses=self._inline_responses(job["inline"]))
+                elif not job["failed"]:
+                    dest_name = f"files/result-{name.rsplit('/', 1)[-1]}"
+                    self.results.setdefault(dest_name, job["path"])
+                    dest = SimpleNamespace(file_name=dest_name)
+            elif elapsed >= job["duration"] / 2:
+                state = "JOB_STATE_RUNNING"
+            else:
+                state = "JOB_STATE_PENDING"
+            return SimpleNamespace(name=name, display_name=job["display_name"], model=job["model"],
+                                   state=SimpleNamespace(name=state), create_time=job["create_time"],
+                                   update_time=update_time, end_time=end_time,
+                                   src=SimpleNamespace(file_name=job["src"]), dest=dest)
+
+    def _inline_responses(self, count):
+        """Inline responses of an inline job, in request order"""
+        padding = "x" * self.response_bytes
+        response = {"candidates": [{"content": {"parts": [{"text": padding}], "role": "model"}}]}
+        return [SimpleNamespace(response=response, error=None) for _ in range(count)]
+
+    def _get(self, name):
+        self._call("get")
+        batch = self._batch(name)
+        if batch is None:
+            raise FakeAPIError(404, f"Batch job not found: {name}")
+        return batch
+
+    def _list_batches(self, config=None):
+        self._call("list")
+        def fetch(offset, size):
+            with self.lock:
+                names = sorted(self.jobs, reverse=True)  # Newest first, as the API lists them
+            # Jobs deleted in the meantime are skipped
+            page = [batch for batch in map(self._batch, names[offset:offset + size]) if batch is not None]
+            return page, offset + size if offset + size < len(names) else None
+        return FakePager(fetch, (config or {}).get("page_size", PAGE_SIZE))
+
+    def _delete_batch(self, name):
+        self._call("delete")
+        with self.lock:
+            if self.jobs.pop(name, None) is None:
+                raise FakeAPIError(404, f"Batch job not found: {name}")
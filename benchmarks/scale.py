@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Measure how submit, poll and cleanup scale against a fake Gemini batch service
+
+Each scenario runs in a fresh interpreter against FakeGemini, so that peak
+RSS belongs to that scenario alone, and reports wall time, API calls, peak
+RSS and job-info lock contention. Results can be saved with --save and
+compared with a saved run with --compare, which fails when wall time or
+peak RSS grew by more than --tolerance.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import FakeGemini
+from gembatch import cleanup, poll, submit
+from gembatch.client import RateBudget, RateLimitedClient
+from gembatch.main import create_parser
+from gembatch.metrics import metrics
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS is not reported
+    resource = None
+
+SCENARIOS = ['submit-10k', 'poll-10k', 'large-io', 'concurrent', 'cleanup']
+REQUEST_BYTES = 200  # Approximate size of a generated request line
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def write_input(path, lines=None, size=None):
+    """Write a JSONL input of a number of lines or of about size bytes"""
+    padding = "x" * (REQUEST_BYTES - 80)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while (lines is not None and i < lines) or (size is not None and written < size):
+            line = json.dumps({"key": f"request-{i}", "request": {"contents": [{"parts": [{"text": padding}]}]}})
+            f.write(line + "\n")
+            written += len(line) + 1
+            i += 1
+    return path
+
+
+def write_inputs(directory, count, lines):
+    """Write count small input files, return their paths"""
+    input_dir = os.path.join(directory, "inputs")
+    os.makedirs(input_dir)
+    return [write_input(os.path.join(input_dir, f"input-{i:05d}.jsonl"), lines=lines) for i in range(count)]
+
+
+def run_submit(client, files, workers, inline_bytes=None):
+    """Run gembatch submit quietly, return False if any file failed"""
+    options = ['--inline-bytes', inline_bytes] if inline_bytes else []
+    args = create_parser().parse_args(['submit', '--workers', str(workers), *options, *files])
+    try:
+        submit.main_with_args(args, client)
+    except SystemExit:
+        return False
+    return True
+
+
+def run_poll(client, args):
+    """Run poll headless until all recorded jobs are done"""
+    poll.poll_jobs("job-info.jsonl", client, args.workers, 'get', args.min_interval, args.max_interval,
+                   args.workers, headless=True)
+
+
+def scenario_submit_10k(client, fake, args):
+    files = write_inputs(".", args.jobs, args.lines)
+    return run_submit(client, files, args.workers, args.inline_bytes)
+
+
+def scenario_poll_10k(client, fake, args):
+    files = write_inputs(".", args.jobs, args.lines)
+    # Submission is setup here; only polling is measured
+    fake.completion_time = 0
+    run_submit(client, files, args.workers, args.inline_bytes)
+    metrics.reset()
+    fake.calls.clear()
+    start = time.perf_counter()
+    run_poll(client, args)
+    return time.perf_counter() - start
+
+
+def scenario_large_io(client, fake, args):
+    path = write_input("large.jsonl", size=args.large_mb * 1024 * 1024)
+    fake.completion_time = 0
+    fake.response_bytes = REQUEST_BYTES
+    ok = run_submit(client, [path], args.workers)
+    run_poll(client, args)
+    return ok
+
+
+def scenario_concurrent(client, fake, args):
+    files = write_inputs(".", args.jobs, args.lines)
+    submitter = threading.Thread(target=run_submit, args=(client, files, args.workers, args.inline_bytes))
+    submitter.start()
+    # Poll from the first recorded job on, while submit keeps adding jobs
+    while submitter.is_alive() and not os.path.exists("job-info.jsonl"):
+        time.sleep(0.01)
+    while True:
+        run_poll(client, args)
+        if not submitter.is_alive():
+            break
+    submitter.join()
+    # Jobs recorded after the last pass finished
+    run_poll(client, args)
+    return True
+
+
+def scenario_cleanup(client, fake, args):
+    files = write_inputs(".", args.jobs, args.lines)
+    for path in files:
+        uploaded = fake.files.upload(file=path)
+        fake.batches.create(model="models/fake", src=uploaded.name)
+    metrics.reset()
+    fake.calls.clear()
+    cleanup_args = create_parser().parse_args(['cleanup', '-y', '--workers', str(args.workers)])
+    start = time.perf_counter()
+    cleanup.main_with_args(cleanup_args, client)
+    return time.perf_counter() - start
+
+
+def run_scenario(name, args):
+    """Run one scenario in this process, return its measurements"""
+    fake = FakeGemini(latency=args.latency, error_rate=args.error_rate, completion_time=args.completion_time,
+                      completion_jitter=args.completion_time / 2, seed=0)
+    # Unlimited budget unless the real rate limits are measured
+    budget = RateBudget() if args.rate_limits else RateBudget(rates={})
+    client = RateLimitedClient(fake, budget)
+    function = globals()["scenario_" + name.replace("-", "_")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                measured = function(client, fake, args)
+            wall = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    # Scenarios with setup return the time of their measured phase
+    if isinstance(measured, float):
+        wall = measured
+    wait = metrics.histogram("gembatch_job_info_lock_wait_seconds")
+    hold = metrics.histogram("gembatch_job_info_lock_hold_seconds")
+    return {
+        "scenario": name,
+        "wall_s": round(wall, 3),
+        "api_calls": dict(sorted(fake.calls.items())),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None,
+        "lock_transactions": hold.count if hold else 0,
+        "lock_wait_s": round(wait.sum, 3) if wait else 0.0,
+        "lock_wait_max_s": round(wait.max, 3) if wait else 0.0,
+        "lock_hold_s": round(hold.sum, 3) if hold else 0.0,
+    }
+
+
+def child_command(name, args):
+    """Command running one scenario in a fresh interpreter"""
+    command = [sys.executable, os.path.abspath(__file__), "--child", name]
+    for option in ["jobs", "lines", "large_mb", "workers", "latency", "error_rate", "completion_time",
+                   "min_interval", "max_interval"]:
+        command += ["--" + option.replace("_", "-"), str(getattr(args, option))]
+    if args.rate_limits:
+        command.append("--rate-limits")
+    if args.inline_bytes:
+        command += ["--inline-bytes", args.inline_bytes]
+    return command
+
+
+def compare(results, baseline_file, tolerance):
+    """Print regressions against a saved run, return True if there are none"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {result["scenario"]: result for result in json.load(f)}
+    ok = True
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if before is None:
+            continue
+        for field in ["wall_s", "peak_rss_mb"]:
+            if before.get(field) and result.get(field) and result[field] > before[field] * (1 + tolerance):
+                print(f"Regression: {result['scenario']} {field} {before[field]} -> {result[field]}",
+                      file=sys.stderr)
+                ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gembatch scaling against a fake Gemini batch service")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--jobs", type=int, default=10000, help="Input files (jobs) per scenario (default: 10000)")
+    parser.add_argument("--lines", type=int, default=10, help="Requests per small input file (default: 10)")
+    parser.add_argument("--large-mb", type=int, default=1024,
+                        help="Input size of the large-io scenario in MB; results are about as large (default: 1024)")
+    parser.add_argument("-w", "--workers", type=int, default=16, help="Submit, poll and cleanup workers (default: 16)")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="Fake API latency per call in seconds (default: 0.005)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of API calls failing with 429/503 (default: 0)")
+    parser.add_argument("--completion-time", type=float, default=2.0,
+                        help="Seconds from job creation to completion (default: 2)")
+    parser.add_argument("--min-interval", type=float, default=0.2, help="Poll min interval (default: 0.2)")
+    parser.add_argument("--max-interval", type=float, default=1.0, help="Poll max interval (default: 1)")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="Apply gembatch's default API rate limits instead of an unlimited budget")
+    parser.add_argument("--inline-bytes", metavar="SIZE",
+                        help="Submit small inputs of at most SIZE (e.g. 100K) as inline requests")
+    parser.add_argument("--save", metavar="FILE", help="Write the results as JSON to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="Fail if results regressed against a saved run")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative growth of wall time and peak RSS (default: 0.2)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args)))
+        return
+
+    results = []
+    print(f"{'Scenario':<12} {'wall':>9} {'API calls':>10} {'peak RSS':>10} "
+          f"{'locks':>7} {'lock wait':>10} {'max wait':>9}")
+    for name in args.scenarios or SCENARIOS:
+        completed = subprocess.run(child_command(name, args), stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            print(f"{name:<12} failed", file=sys.stderr)
+            sys.exit(1)
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        rss = f"{result['peak_rss_mb']:.1f}MB" if result['peak_rss_mb'] is not None else "-"
+        print(f"{name:<12} {result['wall_s']:8.2f}s {sum(result['api_calls'].values()):>10} {rss:>10} "
+              f"{result['lock_transactions']:>7} {result['lock_wait_s']:9.2f}s {result['lock_wait_max_s']:8.2f}s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        print("Benchmark check failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
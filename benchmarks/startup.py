@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Measure gembatch CLI startup time for commands that need no API calls
+
+Each scenario runs the CLI in a fresh interpreter several times and reports
+the median and fastest wall time, next to a bare interpreter start as the
+baseline. A scenario fails if the command exits with an error, if it
+imports the Gemini SDK, or if its median exceeds --max-ms when given, so
+the script can guard startup regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ['google.genai']  # Must not be imported by local-only commands
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CommandError(Exception):
+    """A measured command exited with an error"""
+
+    def __init__(self, returncode, stderr):
+        super().__init__(f"exit status {returncode}")
+        self.stderr = stderr
+
+
+def write_fixtures(directory):
+    """Create a finished job-info and a result file to run commands against"""
+    results_dir = os.path.join(directory, "results")
+    os.makedirs(results_dir)
+    with open(os.path.join(results_dir, "input.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(1000):
+            f.write(json.dumps({"key": f"request-{i}", "response": {"text": f"answer {i}"}}) + "\n")
+    with open(os.path.join(directory, "job-info.jsonl"), "w", encoding="utf-8") as f:
+        job = {
+            "input_file": "input.jsonl",
+            "count": 1000,
+            "batch": {
+                "name": "batches/benchmark",
+                "state": "JOB_STATE_SUCCEEDED",
+                "create_time": "2025-01-01T00:00:00Z",
+                "end_time": "2025-01-01T01:00:00Z",
+            },
+        }
+        f.write(json.dumps(job) + "\n")
+
+
+def run(command, cwd, env):
+    """Run a command, return its wall time in milliseconds
+
+    Raises CommandError if the command fails, so that a crash is never
+    mistaken for a fast startup.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise CommandError(result.returncode, result.stderr)
+    return elapsed
+
+
+def imported_heavy_modules(command, cwd, env):
+    """Return the heavy modules imported by a command, using -X importtime"""
+    result = subprocess.run([command[0], "-X", "importtime", *command[1:]], cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise CommandError(result.returncode, result.stderr)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines()
+                if line.startswith("import time:")}
+    return [module for module in HEAVY_MODULES if module in imported]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gembatch CLI startup time")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Runs per scenario (default: 10)")
+    parser.add_argument("--max-ms", type=float, help="Fail if a scenario's median exceeds this many milliseconds")
+    args = parser.parse_args()
+
+    gembatch = [sys.executable, "-m", "gembatch.main"]
+    scenarios = [
+        ("python (baseline)", [sys.executable, "-c", "pass"]),
+        ("gembatch --version", gembatch + ["--version"]),
+        ("gembatch --help", gembatch + ["--help"]),
+        ("gembatch get", gembatch + ["get", "results/input.jsonl", "request-500"]),
+        ("gembatch poll (finished)", gembatch + ["poll"]),
+    ]
+
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark"))
+    # Commands run in a temporary directory; measure this checkout
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")]))
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixtures(directory)
+        print(f"{'Scenario':<28} {'median':>9} {'min':>9}  heavy imports")
+        for name, command in scenarios:
+            try:
+                # Warm up the file system cache and the index of the result file
+                run(command, directory, env)
+                times = [run(command, directory, env) for _ in range(args.runs)]
+                heavy = [] if name.startswith("python") else imported_heavy_modules(command, directory, env)
+            except CommandError as e:
+                print(f"{name:<28} failed ({e})")
+                print(e.stderr.rstrip(), file=sys.stderr)
+                failed = True
+                continue
+            median = statistics.median(times)
+            print(f"{name:<28} {median:7.1f}ms {min(times):7.1f}ms  {', '.join(heavy) or '-'}")
+            if heavy or (args.max_ms and not name.startswith("python") and median > args.max_ms):
+                failed = True
+
+    if failed:
+        print("Startup check failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,19 @@ Gemini Batch Tools
 Command-line tools for managing Google Gemini batch jobs.
 """
 
-from importlib.metadata import version
+import importlib
 
-__version__ = version("gemini-batch")
 __license__ = "CC0-1.0"
 
-from . import submit, poll
-
 __all__ = ["submit", "poll"]
+
+
+def __getattr__(name):
+    """Load submodules and package metadata on first access"""
+    if name == "__version__":
+        from importlib.metadata import version
+        globals()[name] = version("gemini-batch")
+        return globals()[name]
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,9 +2,17 @@
 import argparse
 import json
 import os
+import sys
 import time
 from pathlib import Path
-from google import genai
+from gembatch.filelock import MAX_RETRY_DELAY, MIN_RETRY_DELAY, FileLock, is_dead_owner, owner_info
+from gembatch.metrics import metrics
+from gembatch.profiling import span
+
+LOCK_WAIT_WARNING = 1.0  # Report lock waits at least this long (seconds)
+COMPLETED_STATES = ['JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED']
+JOURNAL_COMPACT_THRESHOLD = 1000  # Journal records before the base file is rewritten
+FORMAT_VERSION = 2  # Job info files stamped with this version hold no legacy records
 
 def batch_to_dict(batch_job):
     """Convert BatchJob object to dictionary"""
@@ -29,6 +37,11 @@ def get_batch_info(client, batch_name):
     batch = client.batches.get(name=batch_name)
     return batch_to_dict(batch)
 
+def get_result_path(input_file):
+    """Result file path of an input file (results/ next to the input)"""
+    input_path = Path(input_file)
+    return input_path.parent / "results" / input_path.name
+
 def count_lines(filename):
     """Count non-empty lines in a file"""
     count = 0
@@ -38,6 +51,69 @@ def count_lines(filename):
                 count += 1
     return count
 
+def get_version_path(job_info_file):
+    """Sidecar file holding the format version stamp of a job info file"""
+    return f"{job_info_file}.version"
+
+def file_signature(filename):
+    """Size, modification time and inode of a file, which change whenever it is rewritten"""
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+def read_format_stamp(job_info_file):
+    """Format version stamp of a job info file as a dict, or None if it is not stamped"""
+    try:
+        with open(get_version_path(job_info_file), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return stamp if isinstance(stamp, dict) else None
+
+def read_format_version(job_info_file):
+    """Format version stamped on a job info file, or None if it is not stamped
+    
+    A stamp only applies to the file it was written for; a job info file
+    that was replaced since, e.g. by an older version, is not stamped.
+    """
+    stamp = read_format_stamp(job_info_file)
+    if stamp is None:
+        return None
+    try:
+        if stamp.get("signature") != file_signature(job_info_file):
+            return None
+    except OSError:
+        return None
+    return stamp.get("format_version")
+
+def write_format_version(job_info_file, version):
+    """Stamp a job info file with a format version, or remove the stamp if version is None
+    
+    The stamp is kept in a sidecar file so that the job info file itself
+    only holds job records, which older versions can read. It records the
+    signature of the job info file, so it has to be written after the file.
+    """
+    version_path = get_version_path(job_info_file)
+    if version is None:
+        if os.path.exists(version_path):
+            os.remove(version_path)
+        return
+    stamp = {"format_version": version, "signature": file_signature(job_info_file)}
+    tmp_path = f"{version_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f)
+    os.replace(tmp_path, version_path)
+
+def base_signature(job_info_file):
+    """Signature of a job info file for a journal header, or None if it does not exist"""
+    try:
+        return file_signature(job_info_file)
+    except FileNotFoundError:
+        return None
+
+def needs_conversion(job_info):
+    """Check whether a job record is in a legacy format"""
+    return "batch" not in job_info or "count" not in job_info
+
 def convert_job_if_needed(client, job_info):
     """Convert job info if needed, return dict or None if no conversion needed"""
     input_file = job_info["input_file"]
@@ -71,74 +147,250 @@ def convert_job_if_needed(client, job_info):
 
 
 class AtomicJobManager:
-    """Atomic job manager with file locking for safe concurrent access"""
+    """Atomic job manager with file locking for safe concurrent access
+
+    The lock is held on {job_info_file}.lock; changes are staged in
+    {job_info_file}.tmp.new and atomically renamed over the job info file.
+    gembatch 0.3.3 and earlier lock by creating {job_info_file}.tmp
+    exclusively, so it is created the same way to exclude those versions as
+    well, and holds the owner until the lock is released.
+
+    In journal mode, changes are appended to {job_info_file}.journal. Its
+    first line records the signature of the base file the records apply
+    to, so a journal left over from before another program (such as an
+    older version) rewrote the base file is discarded instead of replayed.
+    With enable_journal, the journal is created while the lock is held.
+    """
     
-    def __init__(self, job_info_file, client=None, timeout=30, retry_interval=1, read_only=False):
+    def __init__(self, job_info_file, client=None, timeout=30, retry_interval=1, read_only=False,
+                 compact_threshold=JOURNAL_COMPACT_THRESHOLD, enable_journal=False):
         self.job_info_file = job_info_file
         self.client = client
         self.timeout = timeout
         self.retry_interval = retry_interval
         self.read_only = read_only
+        self.compact_threshold = compact_threshold
+        self.enable_journal = enable_journal
         self.tmp_file = f"{job_info_file}.tmp"
-        self.tmp_file_obj = None
+        self.staging_file = f"{job_info_file}.tmp.new"
+        self.lock = FileLock(f"{job_info_file}.lock", timeout, retry_interval)
+        self.lock_wait_time = 0.0
+        self.journal_file = f"{job_info_file}.journal"
         self.jobs = []
+        self.jobs_by_input_file = {}  # input file -> index in self.jobs
+        self.jobs_by_batch_name = {}  # batch name -> index in self.jobs
+        self.journal_enabled = False
+        self.journal_length = 0  # Records currently in the journal file
+        self.journal_records = []  # Records to append on exit
+        self.journal_stale = False  # Journal belongs to an older base file and was not applied
         self.conversion_occurred = False
         self.modifications_made = False
+        self.format_version = None  # Version stamped in the sidecar version file
         
     def __enter__(self):
         """Acquire lock and load jobs"""
-        start_time = time.time()
+        start_time = time.monotonic()
+        with span("lock", file=self.job_info_file):
+            self.lock.acquire()
+            try:
+                self._create_tmp_file(start_time)
+            except BaseException:
+                self.lock.release()
+                raise
+        self.lock_wait_time = time.monotonic() - start_time
+        self.lock_acquired_at = time.monotonic()
+        if self.lock_wait_time >= LOCK_WAIT_WARNING:
+            print(f"Warning: Waited {self.lock_wait_time:.1f}s for lock on {self.job_info_file}",
+                  file=sys.stderr)
+        
+        try:
+            # Journal mode persists once the journal exists
+            if self.enable_journal and not os.path.exists(self.journal_file):
+                self._reset_journal()
+            # Load existing jobs
+            with span("load", file=self.job_info_file):
+                self._load_jobs()
+        except BaseException:
+            os.remove(self.tmp_file)
+            self.lock.release()
+            raise
+        return self
+    
+    def _create_tmp_file(self, start_time):
+        """Create the tmp file exclusively, waiting while an older version holds it
         
+        Only processes of older versions or crashed processes can own an
+        existing tmp file while the lock is held. The tmp file only carries
+        the owner, also while the jobs are rewritten, so one left by a
+        crashed process of this version is removed; one left by an older
+        version has to be deleted by hand, as before.
+        """
+        delay = MIN_RETRY_DELAY
         while True:
             try:
-                # Try to create tmp file exclusively (atomic lock acquisition)
-                self.tmp_file_obj = open(self.tmp_file, "x", encoding="utf-8")
+                tmp_file_obj = open(self.tmp_file, "x", encoding="utf-8")
                 break
             except FileExistsError:
-                # Lock file exists, wait and retry
-                if time.time() - start_time > self.timeout:
-                    raise TimeoutError(f"Could not acquire lock on {self.job_info_file} within {self.timeout} seconds")
-                time.sleep(self.retry_interval)
-        
-        # Load existing jobs
-        self._load_jobs()
-        return self
+                self._remove_stale_tmp_file()
+            if time.monotonic() - start_time > self.timeout:
+                raise TimeoutError(f"Could not acquire lock on {self.job_info_file} within {self.timeout} seconds "
+                                   f"({self.tmp_file} exists: an older gembatch version is running, "
+                                   f"or it was left behind by a crash and can be deleted)")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+        with tmp_file_obj:
+            json.dump(owner_info(), tmp_file_obj)
+    
+    def _remove_stale_tmp_file(self):
+        """Remove a tmp file whose owner process of this version no longer exists"""
+        try:
+            with open(self.tmp_file, "r", encoding="utf-8") as f:
+                owner = json.loads(f.read() or "null")
+        except (OSError, ValueError):
+            # Missing, or jobs being staged by an older version
+            return
+        if is_dead_owner(owner):
+            try:
+                os.remove(self.tmp_file)
+            except FileNotFoundError:
+                pass
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Release lock and save if modifications were made"""
         try:
+            if not self.read_only and self.journal_stale and not self.conversion_occurred:
+                # Start a journal for the current base file
+                self._reset_journal()
+                self.journal_stale = False
             if not self.read_only and (self.modifications_made or self.conversion_occurred):
-                # Write all jobs to tmp file
-                for job in self.jobs:
-                    json.dump(job, self.tmp_file_obj, ensure_ascii=False)
-                    self.tmp_file_obj.write('\n')
-                self.tmp_file_obj.flush()
-                self.tmp_file_obj.close()
-                
-                # Atomic replacement
-                if os.path.exists(self.job_info_file):
-                    os.remove(self.job_info_file)
-                os.rename(self.tmp_file, self.job_info_file)
-            else:
-                # No changes or read-only mode, just remove tmp file
-                self.tmp_file_obj.close()
-                os.remove(self.tmp_file)
+                with span("save", file=self.job_info_file):
+                    if (self.journal_enabled and not self.conversion_occurred and
+                            self.journal_length + len(self.journal_records) <= self.compact_threshold):
+                        # Append only the changed records to the journal
+                        self._append_journal()
+                    else:
+                        self._rewrite_base()
         except Exception:
             # Cleanup on error
-            if self.tmp_file_obj and not self.tmp_file_obj.closed:
-                self.tmp_file_obj.close()
+            if os.path.exists(self.staging_file):
+                os.remove(self.staging_file)
+            raise
+        finally:
+            # Removing the tmp file lets older versions in again
             if os.path.exists(self.tmp_file):
                 os.remove(self.tmp_file)
-            raise
+            self.lock.release()
+            metrics.observe("gembatch_job_info_lock_wait_seconds", self.lock_wait_time, store="jsonl")
+            metrics.observe("gembatch_job_info_lock_hold_seconds", time.monotonic() - self.lock_acquired_at,
+                            store="jsonl")
+    
+    def _rewrite_base(self):
+        """Write all jobs to the base file and empty the journal (compaction)"""
+        # The jobs are staged apart from the tmp file, so a crash while
+        # writing them leaves the tmp file with its owner, which is reclaimed
+        # json.dumps uses the C encoder, unlike json.dump to a stream, which
+        # keeps the time the lock is held short
+        with open(self.staging_file, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(job, ensure_ascii=False) + '\n' for job in self.jobs)
+        
+        # Atomic replacement
+        os.replace(self.staging_file, self.job_info_file)
+        
+        # Stamp after the rewrite, so a crash in between leaves a stamp that
+        # does not match the file, which only means the conversion check runs
+        write_format_version(self.job_info_file, self.format_version)
+        
+        # The base file now contains every journaled change; after a crash at
+        # this point, the journal no longer matches the base file and is
+        # discarded on load
+        if self.journal_enabled:
+            self._reset_journal()
+    
+    def _reset_journal(self):
+        """Empty the journal, recording the signature of the current base file"""
+        with open(self.journal_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"base": base_signature(self.job_info_file)}) + '\n')
+    
+    def _append_journal(self):
+        """Append pending delta records to the journal file"""
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in self.journal_records)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _index_job(self, index):
+        """Register job at index in the lookup dictionaries (first record wins)"""
+        job = self.jobs[index]
+        input_file = job.get('input_file')
+        if input_file is not None:
+            self.jobs_by_input_file.setdefault(input_file, index)
+        batch_name = job.get('batch', {}).get('name')
+        if batch_name:
+            self.jobs_by_batch_name.setdefault(batch_name, index)
     
     def _load_jobs(self):
         """Load jobs from file and convert if needed"""
         self.jobs = []
+        self.jobs_by_input_file = {}
+        self.jobs_by_batch_name = {}
+        self.journal_enabled = os.path.exists(self.journal_file)
+        self.journal_length = 0
+        self.journal_records = []
+        self.journal_stale = False
         self.conversion_occurred = False
+        self.format_version = None
         
-        if not os.path.exists(self.job_info_file):
+        if os.path.exists(self.job_info_file):
+            # Files stamped by migrate hold no legacy records, so the
+            # per-record conversion check is skipped for them
+            self.format_version = read_format_version(self.job_info_file)
+            self._load_base(check=self.format_version != FORMAT_VERSION)
+        if self.journal_enabled:
+            self._load_journal()
+    
+    def _load_journal(self):
+        """Fold journal records into the jobs loaded from the base file"""
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                try:
+                    header = json.loads(f.readline())
+                except json.JSONDecodeError:
+                    header = None
+                if not isinstance(header, dict) or header.get("base") != base_signature(self.job_info_file):
+                    # The base file was rewritten without the journal, e.g. by
+                    # an older version, so replaying it would revert newer states
+                    print(f"Warning: Discarding job info journal {self.journal_file}, "
+                          f"which does not match the rewritten job info file", file=sys.stderr)
+                    self.journal_stale = True
+                    return
+                for line_num, line in enumerate(f, 2):
+                    if line.strip():
+                        self.journal_length += 1
+                        try:
+                            self._apply_job(json.loads(line)['job'])
+                        except (json.JSONDecodeError, KeyError) as e:
+                            # A crash during append can leave a truncated last record
+                            print(f"Warning: Invalid journal record at line {line_num}: {e}")
+        except Exception as e:
+            print(f"Error: Failed to load job info journal: {e}")
+    
+    def _apply_job(self, job_record):
+        """Replace the job with the same batch name, or append it"""
+        index = self.jobs_by_batch_name.get(job_record.get('batch', {}).get('name'))
+        if index is None:
+            self.jobs.append(job_record)
+            self._index_job(len(self.jobs) - 1)
             return
-            
+        
+        # Keep the input file index in sync if the record changed its input file
+        old_input_file = self.jobs[index].get('input_file')
+        if old_input_file != job_record.get('input_file') and self.jobs_by_input_file.get(old_input_file) == index:
+            del self.jobs_by_input_file[old_input_file]
+        self.jobs[index] = job_record
+        self._index_job(index)
+    
+    def _load_base(self, check=True):
+        """Load jobs from the base file, converting legacy records if check is set"""
         try:
             with open(self.job_info_file, 'r', encoding='utf-8') as f:
                 for line_num, line in enumerate(f, 1):
@@ -147,13 +399,16 @@ class AtomicJobManager:
                             job_record = json.loads(line)
                             
                             # Check if conversion is needed
-                            if self.client:
-                                converted = convert_job_if_needed(self.client, job_record)
-                                if converted is not None:
-                                    job_record = converted
-                                    self.conversion_occurred = True
+                            if check and needs_conversion(job_record):
+                                if self.client:
+                                    with span("convert", input_file=job_record.get("input_file")):
+                                        converted = convert_job_if_needed(self.client, job_record)
+                                    if converted is not None:
+                                        job_record = converted
+                                        self.conversion_occurred = True
                             
                             self.jobs.append(job_record)
+                            self._index_job(len(self.jobs) - 1)
                         except json.JSONDecodeError as e:
                             print(f"Warning: JSON parse error at line {line_num}: {e}")
         except Exception as e:
@@ -165,17 +420,13 @@ class AtomicJobManager:
     
     def find_job_by_input_file(self, filename):
         """Find job by input file name"""
-        for job in self.jobs:
-            if job.get('input_file') == filename:
-                return job
-        return None
+        index = self.jobs_by_input_file.get(filename)
+        return None if index is None else self.jobs[index]
     
     def find_job_by_batch_name(self, batch_name):
         """Find job by batch name"""
-        for job in self.jobs:
-            if job.get('batch', {}).get('name') == batch_name:
-                return job
-        return None
+        index = self.jobs_by_batch_name.get(batch_name)
+        return None if index is None else self.jobs[index]
     
     def add_job(self, job_record):
         """Add new job if not exists, return True if added, False if already exists"""
@@ -187,6 +438,8 @@ class AtomicJobManager:
             return False
         
         self.jobs.append(job_record)
+        self._index_job(len(self.jobs) - 1)
+        self._record_change(job_record)
         self.modifications_made = True
         return True
     
@@ -199,17 +452,27 @@ class AtomicJobManager:
         if not batch_name:
             return False
         
-        for i, job in enumerate(self.jobs):
-            if job.get('batch', {}).get('name') == batch_name:
-                self.jobs[i] = job_record
-                self.modifications_made = True
-                return True
-        return False
+        if batch_name not in self.jobs_by_batch_name:
+            return False
+        
+        self._apply_job(job_record)
+        self._record_change(job_record)
+        self.modifications_made = True
+        return True
+    
+    def _record_change(self, job_record):
+        """Remember a changed job as a journal delta record keyed by batch name"""
+        batch_name = job_record.get('batch', {}).get('name')
+        self.journal_records.append({"batch_name": batch_name, "job": job_record})
     
     def get_all_jobs(self):
         """Get all jobs (for display purposes)"""
         return self.jobs.copy()
     
+    def get_pending_jobs(self):
+        """Get incomplete jobs"""
+        return [job for job in self.jobs if job.get('batch', {}).get('state', '') not in COMPLETED_STATES]
+    
     def bulk_update_jobs(self, job_list):
         """Update multiple jobs efficiently"""
         updated_count = 0
@@ -221,6 +484,38 @@ class AtomicJobManager:
     def was_converted(self):
         """Check if any job conversion occurred"""
         return self.conversion_occurred
+    
+    def apply_migration(self, converted):
+        """Replace legacy records with converted ones and stamp the format version
+        
+        converted maps input file names to converted records. Returns the
+        legacy records left unconverted; the version is only stamped when
+        there are none. The base file is rewritten on exit.
+        """
+        if self.read_only:
+            raise RuntimeError("Cannot migrate in read-only mode")
+        
+        remaining = []
+        for index, job in enumerate(self.jobs):
+            if not needs_conversion(job):
+                continue
+            record = converted.get(job.get('input_file'))
+            if record is None:
+                remaining.append(job)
+            else:
+                self.jobs[index] = record
+        
+        # Rebuild the lookup dictionaries for the new batch names
+        self.jobs_by_input_file = {}
+        self.jobs_by_batch_name = {}
+        for index in range(len(self.jobs)):
+            self._index_job(index)
+        
+        if not remaining:
+            self.format_version = FORMAT_VERSION
+        # Stamping always rewrites the base file, never appends to the journal
+        self.conversion_occurred = True
+        return remaining
 
 
 def main():
@@ -228,6 +523,7 @@ def main():
     parser.add_argument("input_file", help="Input JSONL file containing job information")
     args = parser.parse_args()
     
+    from google import genai
     client = genai.Client(api_key=os.environ["GEMINI_API_KEY"], http_options={"api_version": "v1alpha"})
     
     # Use AtomicJobManager for safe file reading in read-only mode
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of request results shared across submissions
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from gembatch.batch_info import get_result_path
+from gembatch.filelock import FileLock
+from gembatch.index import ResultIndex
+
+DEFAULT_CACHE_SIZE = 1024  # Cache size bound in megabytes
+EVICTION_TARGET = 0.9  # Fraction of the size bound kept after eviction
+
+
+def request_hash(request, model):
+    """Hash a request body together with the model it is sent to"""
+    model = model.removeprefix("models/")
+    canonical = json.dumps({"model": model, "request": request}, sort_keys=True,
+                           separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_cache_dir(input_file):
+    """Directory holding the cache-reduced copy of an input file"""
+    input_path = Path(input_file)
+    return input_path.parent / f"{input_path.name}.cache"
+
+
+class ResultCache:
+    """Directory of cached responses keyed by request hash
+
+    Entries are written atomically, so several processes (and hosts sharing
+    the directory) can use the cache concurrently. Reading an entry updates
+    its modification time, and eviction removes the least recently used
+    entries once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_SIZE * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, digest):
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def get(self, digest):
+        """Return the cached response for a request hash, or None"""
+        path = self._entry_path(digest)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f)["response"]
+            os.utime(path)
+            return response
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, digest, response):
+        """Store a response under a request hash"""
+        path = self._entry_path(digest)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"response": response}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its bound"""
+        try:
+            with FileLock(str(self.cache_dir / ".lock"), timeout=5):
+                entries = []
+                total = 0
+                for path in self.cache_dir.glob("*/*.json"):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+                if total <= self.max_bytes:
+                    return 0
+                removed = 0
+                for _, size, path in sorted(entries):
+                    if total <= self.max_bytes * EVICTION_TARGET:
+                        break
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+                return removed
+        except TimeoutError:
+            # Another process is evicting
+            return 0
+
+
+def read_keyed_requests(input_file):
+    """Yield (key, request) for each request line of a JSONL input"""
+    with open(input_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield data.get("key"), data.get("request")
+
+
+def reduce_with_cache(input_file, model, cache):
+    """Split an input into cache hits and misses
+
+    Hits are written in input order to hits.jsonl in the cache directory of
+    the input, misses to a reduced copy of the input in the same directory.
+    Returns (reduced file, hit count, miss count), or None if the input
+    cannot be cached because keys are missing or repeated.
+    """
+    keys = set()
+    for key, _ in read_keyed_requests(input_file):
+        if key is None or key in keys:
+            return None
+        keys.add(key)
+
+    cache_dir = get_cache_dir(input_file)
+    cache_dir.mkdir(exist_ok=True)
+    reduced_file = cache_dir / Path(input_file).name
+    hits = misses = 0
+    with open(input_file, "r", encoding="utf-8") as f, \
+            open(reduced_file, "w", encoding="utf-8") as reduced, \
+            open(cache_dir / "hits.jsonl", "w", encoding="utf-8") as hit_file:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            response = cache.get(request_hash(data["request"], model))
+            if response is None:
+                reduced.write(line if line.endswith("\n") else line + "\n")
+                misses += 1
+            else:
+                hit_file.write(json.dumps({"key": data["key"], "response": response}, ensure_ascii=False) + "\n")
+                hits += 1
+    return str(reduced_file), hits, misses
+
+
+def merge_cached_results(cache_info):
+    """Merge cached and fresh responses into the original input's result file
+
+    Fresh responses are also added to the cache. The input is streamed once:
+    cached responses are read in lockstep from the hits file, and fresh ones
+    are looked up through the key index of the reduced input's results, so
+    memory does not grow with the result size. Returns the result path, or
+    None if the results of the reduced input are not available yet or the
+    merged file already exists.
+    """
+    input_file = cache_info["input_file"]
+    reduced_file = cache_info["reduced_file"]
+    output_file = get_result_path(input_file)
+    if output_file.exists():
+        return None
+
+    fresh = None
+    if os.path.getsize(reduced_file) > 0:
+        reduced_result = get_result_path(reduced_file)
+        if not reduced_result.exists():
+            return None
+        fresh = ResultIndex(reduced_result)
+
+    # Fresh successful responses are cached for later submissions
+    cache = ResultCache(cache_info["dir"], cache_info.get("max_bytes", DEFAULT_CACHE_SIZE * 1024 * 1024))
+    output_file.parent.mkdir(exist_ok=True)
+    hits_path = get_cache_dir(input_file) / "hits.jsonl"
+    fd, tmp_path = tempfile.mkstemp(dir=output_file.parent, prefix=f".{output_file.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out, open(hits_path, "rb") as hits:
+            # Hits were written in input order, so they are consumed in lockstep
+            next_hit = hits.readline()
+            for key, request in read_keyed_requests(input_file):
+                if next_hit and json.loads(next_hit)["key"] == key:
+                    out.write(next_hit)
+                    next_hit = hits.readline()
+                    continue
+                line = fresh.get(key) if fresh is not None else None
+                if line is None:
+                    continue
+                out.write(line + b"\n")
+                response = json.loads(line).get("response")
+                if response is not None:
+                    cache.put(request_hash(request, cache_info["model"]), response)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if fresh is not None:
+            fresh.close()
+    cache.evict()
+    return output_file
@@ -5,50 +5,152 @@ Clean up Gemini batch resources (files and batch jobs)
 
 import sys
 import os
-import argparse
-from google import genai
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gembatch.batch_info import COMPLETED_STATES
+from gembatch.job_store import open_job_manager
+
+DEFAULT_WORKERS = 8  # Concurrent delete requests
+LIST_PAGE_SIZE = 100  # Resources per page when listing files and batch jobs
+
+
+def referenced_resources(job_info_file):
+    """Collect file and batch names recorded in a job info store
+
+    Returns (files, batches, active_files): active_files holds the uploaded
+    inputs of jobs that have not reached a terminal state.
+    """
+    files, batches, active_files = set(), set(), set()
+    if not os.path.exists(job_info_file):
+        return files, batches, active_files
+    with open_job_manager(job_info_file, read_only=True) as manager:
+        jobs = manager.get_all_jobs()
+    for job in jobs:
+        batch = job.get('batch', {})
+        batch_name = batch.get('name') or job.get('job_name')
+        if batch_name:
+            batches.add(batch_name)
+        uploaded = job.get('uploaded_file_name')
+        if uploaded:
+            files.add(uploaded)
+            if batch.get('state') not in COMPLETED_STATES:
+                active_files.add(uploaded)
+        result_file = (batch.get('dest') or {}).get('file_name')
+        if result_file:
+            files.add(result_file)
+    return files, batches, active_files
+
+
+def is_older(resource, cutoff):
+    """Check whether a resource was created before cutoff (POSIX time)
+
+    Resources without a create time are treated as new, so they are kept.
+    """
+    if cutoff is None:
+        return True
+    create_time = getattr(resource, 'create_time', None)
+    return create_time is not None and create_time.timestamp() < cutoff
+
+
+def find_targets(client, args):
+    """List resources page by page and keep the names that pass all filters"""
+    cutoff = None
+    if args.older_than is not None:
+        cutoff = time.time() - args.older_than * 3600
+    referenced_files = referenced_batches = None
+    active_files = set()
+    if args.job_info_only or args.terminal_only:
+        files, batches, active_files = referenced_resources(args.job_info)
+        if args.job_info_only:
+            referenced_files, referenced_batches = files, batches
+
+    # Batch jobs are listed first so that inputs and outputs of running jobs
+    # can be protected when only terminal jobs are cleaned up
+    batch_targets = []
+    for batch in client.batches.list(config={"page_size": LIST_PAGE_SIZE}):
+        if args.terminal_only and batch.state.name not in COMPLETED_STATES:
+            for source in (batch.src, batch.dest):
+                file_name = getattr(source, 'file_name', None)
+                if file_name:
+                    active_files.add(file_name)
+            continue
+        if referenced_batches is not None and batch.name not in referenced_batches:
+            continue
+        if not is_older(batch, cutoff):
+            continue
+        batch_targets.append(batch.name)
+
+    file_targets = []
+    for file in client.files.list(config={"page_size": LIST_PAGE_SIZE}):
+        if referenced_files is not None and file.name not in referenced_files:
+            continue
+        if file.name in active_files or not is_older(file, cutoff):
+            continue
+        file_targets.append(file.name)
+    return file_targets, batch_targets
+
+
+def delete_resources(client, file_targets, batch_targets, max_workers=DEFAULT_WORKERS):
+    """Delete files and batch jobs concurrently, return the number of failures
+
+    Each delete waits for the delete budget of the client, so the workers
+    together stay within its rate.
+    """
+    def delete(kind, name):
+        if kind == "file":
+            client.files.delete(name=name)
+        else:
+            client.batches.delete(name=name)
+
+    tasks = [("file", name) for name in file_targets] + [("batch job", name) for name in batch_targets]
+    errors = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as executor:
+        futures = {executor.submit(delete, kind, name): (kind, name) for kind, name in tasks}
+        for future in as_completed(futures):
+            kind, name = futures[future]
+            try:
+                future.result()
+                print(f"Deleted {kind}: {name}")
+            except Exception as e:
+                errors += 1
+                print(f"Error deleting {kind} {name}: {e}", file=sys.stderr)
+    return errors
 
 
 def main_with_args(args, client):
     """Main function that accepts parsed arguments and initialized client"""
-    
+
+    file_targets, batch_targets = find_targets(client, args)
+
     print("=== File List ===")
-    files = list(client.files.list())
-    for file in files:
-        print(f"- {file.name}")
+    for name in file_targets:
+        print(f"- {name}")
 
     print("\n=== Batch Job List ===")
-    batches = list(client.batches.list())
-    for batch in batches:
-        print(f"- {batch.name}")
+    for name in batch_targets:
+        print(f"- {name}")
 
     print()
-    if not files and not batches:
+    if not file_targets and not batch_targets:
         print("No resources to delete.")
         return
 
-    print(f"Targets to delete: {len(files)} files, {len(batches)} batch jobs")
-    
+    print(f"Targets to delete: {len(file_targets)} files, {len(batch_targets)} batch jobs")
+
+    if args.dry_run:
+        print("Dry run: nothing was deleted.")
+        return
+
     if not args.yes:
         confirm = input("Delete all? (y/N): ").strip().lower()
         if confirm not in ["y", "yes"]:
             print("Deletion cancelled.")
             return
 
-    for file in files:
-        print(f"Deleting file: {file.name}")
-        try:
-            client.files.delete(name=file.name)
-            print("Deleted.")
-        except Exception as e:
-            print(f"Error occurred during deletion: {e}", file=sys.stderr)
-
-    for batch in batches:
-        print(f"Deleting batch job: {batch.name}")
-        try:
-            client.batches.delete(name=batch.name)
-            print("Deleted.")
-        except Exception as e:
-            print(f"Error occurred during deletion: {e}", file=sys.stderr)
-
-    print("\nCleanup completed.")
+    # --rate replaces the delete rate of the budget rather than adding a
+    # second limiter on top of it
+    if args.rate is not None:
+        client.budget.set_rate("delete", args.rate)
+    errors = delete_resources(client, file_targets, batch_targets, args.workers)
+
+    print(f"\nCleanup completed with {errors} errors." if errors else "\nCleanup completed.")
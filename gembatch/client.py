@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Rate-limited Gemini client with retries and a budget shared between processes
+"""
+
+import functools
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from gembatch.events import EventLog
+from gembatch.filelock import FileLock
+from gembatch.metrics import metrics
+from gembatch.profiling import span
+
+# Default requests per second per endpoint, shared by all processes using the
+# same API key; override with GEMBATCH_RATE_<ENDPOINT> or --api-rate ENDPOINT=N
+ENDPOINT_RATES = {
+    "upload": 2.0,
+    "create": 1.0,
+    "get": 10.0,
+    "list": 2.0,
+    "download": 4.0,
+    "delete": 10.0,
+}
+METHOD_ENDPOINTS = {name: name for name in ENDPOINT_RATES}  # Client methods and their endpoints
+IDEMPOTENT_ENDPOINTS = {"get", "list", "download", "delete"}  # Safe to retry after any transient error
+REJECTED_CODES = {429, 503}  # Requests refused before any work was done, safe to retry everywhere
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 6  # Attempts per call, including the first
+BASE_BACKOFF = 1.0  # Upper bound of the first retry delay (seconds)
+MAX_BACKOFF = 60.0  # Upper bound of any retry delay (seconds)
+RATE_ENV_PREFIX = "GEMBATCH_RATE_"  # Environment variables overriding endpoint rates
+
+
+def default_budget_file(api_key):
+    """Budget state file shared by all processes using an API key"""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "gembatch", f"budget-{digest}.json")
+
+
+def parse_rate(spec):
+    """Parse an ENDPOINT=N rate override, return (endpoint, rate)"""
+    endpoint, sep, value = spec.partition("=")
+    endpoint = endpoint.strip().lower()
+    if not sep or endpoint not in ENDPOINT_RATES:
+        raise ValueError(f"expected ENDPOINT=N with ENDPOINT one of {', '.join(ENDPOINT_RATES)}: {spec}")
+    try:
+        rate = float(value)
+    except ValueError:
+        raise ValueError(f"invalid rate for {endpoint}: {value}") from None
+    if rate < 0:
+        raise ValueError(f"rate for {endpoint} must not be negative: {value}")
+    return endpoint, rate
+
+
+def configured_rates(overrides=(), environ=None):
+    """Endpoint rates with environment and command-line overrides applied
+
+    GEMBATCH_RATE_<ENDPOINT> variables override ENDPOINT_RATES, and
+    overrides, a sequence of (endpoint, rate) pairs, override both. A rate
+    of 0 disables limiting for that endpoint. Raises ValueError for an
+    unknown endpoint or an invalid rate.
+    """
+    environ = os.environ if environ is None else environ
+    rates = dict(ENDPOINT_RATES)
+    for name, value in environ.items():
+        if name.startswith(RATE_ENV_PREFIX):
+            endpoint, rate = parse_rate(f"{name[len(RATE_ENV_PREFIX):]}={value}")
+            rates[endpoint] = rate
+    rates.update(overrides)
+    return rates
+
+
+def error_code(error):
+    """HTTP status code of an API error, or None"""
+    code = getattr(error, "code", None)
+    if code is None:
+        code = getattr(error, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_connection_error(error):
+    """Check for network errors without importing the HTTP library"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+def is_retryable(endpoint, error):
+    """Check whether a failed call may be repeated
+
+    Calls that create resources are only repeated when the server refused
+    them, since a timed-out upload or create may have succeeded.
+    """
+    code = error_code(error)
+    if code in REJECTED_CODES:
+        return True
+    if endpoint not in IDEMPOTENT_ENDPOINTS:
+        return False
+    return code in TRANSIENT_CODES or is_connection_error(error)
+
+
+def backoff_delay(attempt, base=BASE_BACKOFF, maximum=MAX_BACKOFF):
+    """Jittered exponential delay before retry number attempt (0-based)"""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class RateBudget:
+    """Token buckets per endpoint, optionally shared between processes
+
+    Each endpoint refills at its rate and holds at most one second of
+    requests. With a state file, bucket levels are kept in that file under a
+    FileLock, so concurrent submit and poll processes draw from one budget;
+    without it, buckets are shared by the threads of this process only.
+    """
+
+    def __init__(self, rates=None, state_file=None):
+        self.rates = dict(ENDPOINT_RATES if rates is None else rates)
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.state = {}  # endpoint -> [tokens, update time]
+
+    def set_rate(self, endpoint, rate):
+        """Change the rate of an endpoint for this process (0: unlimited)"""
+        self.rates[endpoint] = rate
+
+    def _read_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            # Missing or damaged state starts from full buckets
+            return {}
+
+    def _write_state(self, state):
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def _update(self, change):
+        """Apply change(state) to the current bucket levels, return its result"""
+        with self.lock:
+            if self.state_file is None:
+                return change(self.state)
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            with FileLock(f"{self.state_file}.lock"):
+                state = self._read_state()
+                result = change(state)
+                self._write_state(state)
+                return result
+
+    def _take(self, endpoint, state):
+        """Take a token if available, return the seconds to wait otherwise"""
+        rate = self.rates[endpoint]
+        burst = max(1.0, rate)
+        now = time.time()
+        tokens, updated = state.get(endpoint, (burst, now))
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        delay = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            delay = (1 - tokens) / rate
+        state[endpoint] = [tokens, now]
+        return delay
+
+    def acquire(self, endpoint):
+        """Block until a request to endpoint may be made"""
+        if self.rates.get(endpoint, 0) <= 0:
+            return
+        while True:
+            delay = self._update(lambda state: self._take(endpoint, state))
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def throttle(self, endpoint):
+        """Empty an endpoint's bucket after the server reported exhausted quota"""
+        if self.rates.get(endpoint, 0) <= 0:
+            return
+        def drain(state):
+            state[endpoint] = [0.0, time.time()]
+        self._update(drain)
+
+
+class _ResourceProxy:
+    """Proxy for client.files or client.batches that limits and retries calls"""
+
+    def __init__(self, owner, resource):
+        self._owner = owner
+        self._resource = resource
+
+    def __getattr__(self, name):
+        method = getattr(getattr(self._owner.client, self._resource), name)
+        endpoint = METHOD_ENDPOINTS.get(name)
+        if endpoint is None:
+            return method
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            result = self._owner.call(endpoint, method, *args, **kwargs)
+            if endpoint == "list":
+                return self._owner.paginate(result)
+            return result
+        return call
+
+
+class RateLimitedClient:
+    """Gemini client wrapper used by every command
+
+    Calls to files and batches methods first take a token from the budget
+    of their endpoint and are retried with jittered exponential backoff on
+    transient errors. Other attributes are passed through to the client.
+    Retries are reported as "retry" events to events.
+    """
+
+    def __init__(self, client, budget=None, max_attempts=MAX_ATTEMPTS, events=None):
+        self.client = client
+        self.budget = budget or RateBudget()
+        self.max_attempts = max_attempts
+        self.events = events or EventLog()
+        self.files = _ResourceProxy(self, "files")
+        self.batches = _ResourceProxy(self, "batches")
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def call(self, endpoint, method, *args, **kwargs):
+        """Call method under the endpoint budget, retrying transient errors"""
+        attempt = 0
+        while True:
+            start_time = time.monotonic()
+            self.budget.acquire(endpoint)
+            call_time = time.monotonic()
+            metrics.observe("gembatch_api_budget_wait_seconds", call_time - start_time, endpoint=endpoint)
+            try:
+                with span(f"api.{endpoint}"):
+                    result = method(*args, **kwargs)
+            except Exception as e:
+                metrics.observe("gembatch_api_latency_seconds", time.monotonic() - call_time, endpoint=endpoint)
+                if attempt + 1 >= self.max_attempts or not is_retryable(endpoint, e):
+                    metrics.inc("gembatch_api_requests_total", endpoint=endpoint, outcome="error")
+                    raise
+                metrics.inc("gembatch_api_requests_total", endpoint=endpoint, outcome="retry")
+                if error_code(e) == 429:
+                    self.budget.throttle(endpoint)
+                delay = backoff_delay(attempt)
+                self.events.emit("retry", endpoint=endpoint, attempt=attempt + 1,
+                                 code=error_code(e), error=str(e), delay=round(delay, 3))
+                time.sleep(delay)
+                attempt += 1
+                # A streamed download starts over in an emptied destination
+                destination = kwargs.get("destination")
+                if endpoint == "download" and hasattr(destination, "truncate"):
+                    destination.seek(0)
+                    destination.truncate()
+                continue
+            metrics.observe("gembatch_api_latency_seconds", time.monotonic() - call_time, endpoint=endpoint)
+            metrics.inc("gembatch_api_requests_total", endpoint=endpoint, outcome="ok")
+            return result
+
+    def paginate(self, pager):
+        """Iterate a pager, fetching each further page under the list budget"""
+        if not (hasattr(pager, "page") and hasattr(pager, "next_page")):
+            yield from pager
+            return
+        while True:
+            yield from list(pager.page)
+            if not (pager.config or {}).get("page_token"):
+                return
+            self.call("list", pager.next_page)
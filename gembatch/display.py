@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Rich TUI for job status monitoring
+"""
+
+import math
+import time
+from datetime import datetime
+from rich.table import Table
+from rich.columns import Columns
+from rich.align import Align
+from rich.console import Console
+from rich.panel import Panel
+from rich.text import Text
+from gembatch.batch_info import COMPLETED_STATES
+from gembatch.scheduler import parse_timestamp
+from gembatch.profiling import span
+
+PAGE_INTERVAL = 10  # Seconds each page of a long job list stays on screen
+RESERVED_LINES = 14  # Terminal lines used by the panel around the job rows
+MIN_ROWS = 5  # Smallest job window regardless of terminal height
+
+# State -> (status label, style, summary label)
+STATE_DISPLAY = {
+    'JOB_STATE_SUCCEEDED': ("✓ Success", "green", "Succeeded"),
+    'JOB_STATE_FAILED': ("✗ Failed", "red", "Failed"),
+    'JOB_STATE_CANCELLED': ("⊘ Cancelled", "orange1", "Cancelled"),
+}
+
+console = Console()
+
+
+def to_local_time(iso_time_str):
+    """Convert ISO time string to local time string"""
+    if not iso_time_str:
+        return ""
+    try:
+        # Parse ISO format and convert to local time
+        dt = datetime.fromisoformat(iso_time_str.replace('Z', '+00:00'))
+        local_dt = dt.astimezone()
+        return local_dt.strftime('%Y-%m-%d %H:%M:%S')
+    except Exception:
+        return iso_time_str[:19].replace('T', ' ')
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class JobStatusDisplay:
+    """Updatable job status display
+
+    One instance is kept for the whole polling session. Row cells, including
+    parsed and formatted timestamps, are cached per job and rebuilt only when
+    the job's state, times or checking flag change; only the durations of
+    running jobs are recomputed when rendering. Long job lists are shown as a
+    window of at most max_rows rows that pages through the jobs, pending
+    first, with aggregate counts by state in the summary. refresh() limits
+    screen updates to one per render_interval.
+    """
+    def __init__(self, jobs=None, last_update="", checking_job_indices=None, downloading=0,
+                 max_rows=None, render_interval=0):
+        self.max_rows = max_rows
+        self.render_interval = render_interval
+        self.jobs = []
+        self.checking = set()  # batch names being checked
+        self.downloading = 0
+        self.countdown = None
+        self.last_update = last_update
+        self.pending_jobs = 0
+        self.state_counts = {}
+        self._rows = {}  # batch name -> (row signature, cached cells, create timestamp)
+        self._last_render = None
+        self._dirty = True
+        if jobs is not None:
+            checking = {jobs[i]['batch']['name'] for i in checking_job_indices or ()}
+            self.update(jobs, last_update, checking, downloading)
+
+    def update(self, jobs, last_update, checking=None, downloading=0):
+        """Replace the job list and recount states"""
+        self.jobs = jobs
+        self.last_update = last_update
+        self.checking = set(checking or ())
+        self.downloading = downloading
+        self.countdown = None
+
+        counts = {}
+        names = set()
+        for job in jobs:
+            state = job['batch'].get('state', '')
+            counts[state] = counts.get(state, 0) + 1
+            names.add(job['batch']['name'])
+        self.state_counts = counts
+        self.pending_jobs = len(jobs) - sum(counts.get(state, 0) for state in COMPLETED_STATES)
+
+        # Forget rows of jobs that are no longer listed
+        for name in self._rows.keys() - names:
+            del self._rows[name]
+        self._dirty = True
+
+    def set_checking(self, names):
+        """Mark the jobs being checked"""
+        self.checking = set(names)
+        self._dirty = True
+
+    def update_countdown(self, countdown):
+        """Update only the countdown part"""
+        if countdown != self.countdown:
+            self.countdown = countdown
+            self._dirty = True
+
+    def set_checking_status(self):
+        """Mark that the checking status should be shown"""
+        self._dirty = True
+
+    def refresh(self, live, force=False):
+        """Render to a Live display if something changed and the render interval has passed"""
+        now = time.monotonic()
+        if not force:
+            if not self._dirty and not self._page_changed(now):
+                return False
+            if self._last_render is not None and now - self._last_render < self.render_interval:
+                return False
+        with span("render", jobs=len(self.jobs)):
+            live.update(self)
+            live.refresh()
+        self._last_render = now
+        self._dirty = False
+        return True
+
+    def _page_changed(self, now):
+        return (self._last_render is not None and self._page_count() > 1 and
+                int(now / PAGE_INTERVAL) != int(self._last_render / PAGE_INTERVAL))
+
+    def _window_size(self):
+        if self.max_rows:
+            return self.max_rows
+        return max(MIN_ROWS, console.size.height - RESERVED_LINES)
+
+    def _page_count(self):
+        return max(1, math.ceil(len(self.jobs) / self._window_size()))
+
+    def _row(self, job):
+        """Cached cells of a job row and its create timestamp"""
+        batch = job['batch']
+        name = batch['name']
+        state = batch.get('state', '')
+        checking = name in self.checking
+        signature = (state, batch.get('create_time'), batch.get('end_time'),
+                     job.get('count', 0), job['input_file'], checking)
+        cached = self._rows.get(name)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+
+        if state in COMPLETED_STATES:
+            status, style, _ = STATE_DISPLAY.get(state, ("✓ Completed", "green", None))
+        else:
+            status = "⏳ Running"
+            style = "white on red" if checking else "yellow"
+
+        create_time = batch.get('create_time', '')
+        end_time = batch.get('end_time', '')
+        created = parse_timestamp(create_time)
+        ended = parse_timestamp(end_time)
+        duration = format_duration(ended - created) if created is not None and ended is not None else None
+        count = job.get('count', 0)
+        cells = (
+            job['input_file'],
+            f"{count:,}" if count > 0 else "",
+            Text(status, style=style),
+            to_local_time(create_time),
+            to_local_time(end_time),
+            duration,
+        )
+        # Running jobs get their duration at render time
+        self._rows[name] = (signature, cells, None if end_time else created)
+        return cells, self._rows[name][2]
+
+    def _visible_jobs(self):
+        """Jobs in the current window, with a caption when not all are shown"""
+        size = self._window_size()
+        if len(self.jobs) <= size:
+            return self.jobs, None
+        ordered = ([job for job in self.jobs if job['batch'].get('state') not in COMPLETED_STATES] +
+                   [job for job in self.jobs if job['batch'].get('state') in COMPLETED_STATES])
+        pages = self._page_count()
+        page = int(time.monotonic() / PAGE_INTERVAL) % pages
+        start = page * size
+        visible = ordered[start:start + size]
+        caption = f"Jobs {start + 1}-{start + len(visible)} of {len(ordered)} (page {page + 1}/{pages})"
+        return visible, caption
+
+    def _build_table(self):
+        visible, caption = self._visible_jobs()
+        table = Table(title="Batch Job Monitor", caption=caption)
+        table.add_column("Input File", style="cyan")
+        table.add_column("Count", style="blue", justify="right")
+        table.add_column("State", style="magenta")
+        table.add_column("Create Time", style="dim")
+        table.add_column("End Time", style="green")
+        table.add_column("Duration", style="yellow", justify="right")
+
+        now = time.time()
+        for job in visible:
+            cells, running_since = self._row(job)
+            duration = cells[5]
+            if duration is None:
+                duration = format_duration(now - running_since) if running_since is not None else ""
+            table.add_row(*cells[:5], duration)
+        return table
+
+    def _build_summary(self):
+        total_jobs = len(self.jobs)
+        completed_count = total_jobs - self.pending_jobs
+
+        summary = Text()
+        summary.append(f"Total jobs: {total_jobs} | ", style="bold")
+        summary.append(f"Completed: {completed_count} | ", style="green bold")
+        summary.append(f"Remaining: {self.pending_jobs}", style="yellow bold")
+        for state, (_, style, label) in STATE_DISPLAY.items():
+            # Success is implied by the totals unless something went wrong
+            if state != 'JOB_STATE_SUCCEEDED' and self.state_counts.get(state):
+                summary.append(f" | {label}: {self.state_counts[state]}", style=f"{style} bold")
+        if self.downloading:
+            summary.append(f" | Downloading: {self.downloading}", style="blue bold")
+
+        # Add status or countdown
+        if self.checking:
+            plural = "s" if len(self.checking) != 1 else ""
+            summary.append(f" | Checking {len(self.checking)} job{plural}...", style="orange1 bold")
+        elif self.countdown is not None:
+            summary.append(f" | Next poll: {self.countdown}s", style="cyan")
+        return summary
+
+    def __rich__(self):
+        panel_content = [
+            Text(f"Last update: {self.last_update}", style="dim"),
+            Text(""),
+            self._build_table(),
+            Text(""),
+            Align.left(self._build_summary())
+        ]
+
+        if self.pending_jobs == 0 and not self.downloading:
+            panel_content.append(Text(""))
+            panel_content.append(Text("🎉 All jobs completed!", style="green bold"))
+
+        return Panel(
+            Align.center(Columns(panel_content, equal=True, expand=True)),
+            title="Gemini Batch Job Monitor",
+            border_style="blue"
+        )
+
+
+def create_job_status_display(jobs, last_update, countdown=None, downloading=0):
+    """Create a table display for job status (legacy function)"""
+    display = JobStatusDisplay(jobs, last_update, downloading=downloading)
+    if countdown is not None:
+        display.update_countdown(countdown)
+    return display
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Machine-readable JSONL event stream for headless polling
+"""
+
+import json
+import sys
+import threading
+from datetime import datetime, timezone
+
+
+class EventLog:
+    """Thread-safe writer of one JSON object per line
+
+    Every event carries its UTC time and event name. Lines are flushed as
+    they are written so that consumers reading a pipe see events at once.
+    An EventLog without a stream discards events, so callers never need to
+    check whether events are enabled.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.stream is not None
+
+    def emit(self, event, **fields):
+        """Write an event with the given fields"""
+        if self.stream is None:
+            return
+        with self.lock:
+            # Stamped under the lock so that times never go backwards in the stream
+            record = {"time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event}
+            record.update(fields)
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        """Close the stream unless it is standard output"""
+        if self.stream is not None and self.stream is not sys.stdout:
+            self.stream.close()
+
+
+def open_event_log(path):
+    """Open an event log appending to a file, or writing to stdout for '-'"""
+    if path is None:
+        return EventLog()
+    if path == '-':
+        return EventLog(sys.stdout)
+    return EventLog(open(path, "a", encoding="utf-8"))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Inter-process file lock with owner tracking and stale lock recovery
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: fall back to exclusive file creation
+    fcntl = None
+
+MIN_RETRY_DELAY = 0.005  # First retry delay while polling for an exclusively created file
+MAX_RETRY_DELAY = 0.1  # Longest retry delay while polling for an exclusively created file
+
+
+def pid_alive(pid):
+    """Check whether a local process is still running"""
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            # Access denied means the process exists
+            return kernel32.GetLastError() == 5
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_info():
+    """Owner information of the current process as written to lock files"""
+    return {"pid": os.getpid(), "host": socket.gethostname(), "acquired": time.time()}
+
+
+def is_dead_owner(owner):
+    """Check whether owner information belongs to a process on this host that no longer exists"""
+    return (isinstance(owner, dict) and owner.get('host') == socket.gethostname() and
+            not pid_alive(owner.get('pid', 0)))
+
+
+class FileLock:
+    """Exclusive lock on a lock file, usable as a context manager
+
+    With fcntl available, the lock is an OS advisory lock (flock), which the
+    kernel releases automatically when its owner dies; a contended lock is
+    waited for with a blocking flock, which the kernel grants as soon as it
+    is released. Otherwise the lock is
+    the exclusive creation of the lock file, and locks left behind by dead
+    processes on the same host are reclaimed. In both cases the owner's PID,
+    host and acquire time are written to the lock file, and the time spent
+    waiting is available as wait_time.
+    """
+
+    def __init__(self, lock_file, timeout=30, retry_interval=1):
+        self.lock_file = lock_file
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.fd = None
+        self.wait_time = 0.0
+        self.acquired_at = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def owner(self):
+        """Read owner information from the lock file, or None if unavailable"""
+        try:
+            with open(self.lock_file, "r", encoding="utf-8") as f:
+                return json.loads(f.read() or "null")
+        except (OSError, ValueError):
+            return None
+
+    def describe_owner(self):
+        """Human-readable owner description for messages"""
+        owner = self.owner()
+        if not owner:
+            return "unknown owner"
+        return f"pid {owner.get('pid')} on {owner.get('host')}"
+
+    def acquire(self):
+        """Acquire the lock, raise TimeoutError if it is not available within timeout"""
+        start_time = time.monotonic()
+        delay = MIN_RETRY_DELAY
+        while True:
+            if self._try_acquire():
+                break
+            if fcntl and self._wait_flock(self.timeout - (time.monotonic() - start_time)):
+                break
+            if time.monotonic() - start_time > self.timeout:
+                raise TimeoutError(f"Could not acquire lock {self.lock_file} within {self.timeout} seconds "
+                                   f"(held by {self.describe_owner()})")
+            if not fcntl:
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_interval)
+        self.wait_time = time.monotonic() - start_time
+        self.acquired_at = time.time()
+        self._write_owner()
+
+    def release(self):
+        """Release the lock"""
+        if self.fd is None:
+            return
+        try:
+            if fcntl:
+                # Keep the file: removing a flock'ed file races with waiters
+                os.ftruncate(self.fd, 0)
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+                os.close(self.fd)
+            else:
+                os.close(self.fd)
+                os.remove(self.lock_file)
+        finally:
+            self.fd = None
+
+    def _try_acquire(self):
+        if fcntl:
+            fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self.fd = fd
+            return True
+
+        try:
+            self.fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            return True
+        except FileExistsError:
+            self._reclaim_if_stale()
+            return False
+
+    def _wait_flock(self, timeout):
+        """Wait up to timeout seconds in a blocking flock, return True if the lock was taken
+
+        A blocking flock cannot be interrupted portably, so it runs on a
+        helper thread while the caller waits for it with a timeout. If the
+        caller gives up first, the helper releases the lock as soon as it
+        gets it.
+        """
+        if timeout <= 0:
+            return False
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        done = threading.Event()
+        state_lock = threading.Lock()
+        state = {"locked": False, "abandoned": False, "error": None}
+
+        def wait():
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError as e:
+                state["error"] = e
+            with state_lock:
+                if state["error"] is None and not state["abandoned"]:
+                    state["locked"] = True
+                else:
+                    # Closing the descriptor also releases a lock taken too late
+                    os.close(fd)
+                    state["abandoned"] = True
+            done.set()
+
+        threading.Thread(target=wait, name="gembatch-flock", daemon=True).start()
+        try:
+            done.wait(timeout)
+        finally:
+            with state_lock:
+                if not state["locked"]:
+                    state["abandoned"] = True
+        if state["error"] is not None:
+            raise state["error"]
+        if state["locked"]:
+            self.fd = fd
+            return True
+        return False
+
+    def _reclaim_if_stale(self):
+        """Remove a lock file whose owner process on this host no longer exists"""
+        owner = self.owner()
+        if not is_dead_owner(owner):
+            return
+        # Only remove the lock if it still belongs to the dead owner
+        if self.owner() == owner:
+            try:
+                os.remove(self.lock_file)
+            except FileNotFoundError:
+                pass
+
+    def _write_owner(self):
+        owner = dict(owner_info(), acquired=self.acquired_at)
+        os.ftruncate(self.fd, 0)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, json.dumps(owner).encode("utf-8"))
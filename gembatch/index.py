@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Sidecar byte-offset index for random access to result files by key
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+INDEX_MAGIC = b"GBIDX001"
+HEADER = struct.Struct("<8sQQ")  # magic, result file size, entry count
+ENTRY = struct.Struct("<QQI")  # key hash, line offset, line length
+
+
+def get_index_path(result_file):
+    """Sidecar index path of a result file"""
+    result_path = Path(result_file)
+    return result_path.parent / f"{result_path.name}.idx"
+
+
+def key_hash(key):
+    """64-bit hash of a request key"""
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build_index(result_file):
+    """Write the sidecar index of a result file, return the index path
+
+    The result file is scanned once; each entry maps the hash of a line's
+    key to the byte offset and length of the line. Entries are sorted by
+    hash so that lookups can binary search the memory-mapped index.
+    """
+    entries = []
+    with open(result_file, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                key = json.loads(line).get("key")
+                if key is not None:
+                    entries.append((key_hash(key), offset, len(line.rstrip(b"\r\n"))))
+            offset += len(line)
+    entries.sort()
+
+    index_path = get_index_path(result_file)
+    fd, tmp_path = tempfile.mkstemp(dir=index_path.parent, prefix=f".{index_path.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(HEADER.pack(INDEX_MAGIC, offset, len(entries)))
+            for entry in entries:
+                out.write(ENTRY.pack(*entry))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return index_path
+
+
+def index_is_current(result_file):
+    """Check whether the index exists and matches the result file size"""
+    try:
+        with open(get_index_path(result_file), "rb") as f:
+            magic, size, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == INDEX_MAGIC and size == os.path.getsize(result_file)
+
+
+class ResultIndex:
+    """Read-only key lookup over a result file and its index, both memory-mapped"""
+
+    def __init__(self, result_file):
+        self.result_file = result_file
+        if not index_is_current(result_file):
+            build_index(result_file)
+        self._files = []
+        self.index = self._map(get_index_path(result_file))
+        self.results = self._map(result_file)
+        _, _, self.count = HEADER.unpack_from(self.index, 0)
+        # Sorted hash column for bisect, read lazily from the mapping
+        self.hashes = _HashColumn(self.index, self.count)
+
+    def _map(self, path):
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.path.getsize(path) == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for data in (self.index, self.results):
+            if isinstance(data, mmap.mmap):
+                data.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, key):
+        """Return the result line (bytes) for a key, or None"""
+        target = key_hash(key)
+        i = bisect.bisect_left(self.hashes, target)
+        # Check every entry with the same hash to rule out collisions
+        while i < self.count:
+            entry_hash, offset, length = ENTRY.unpack_from(self.index, HEADER.size + i * ENTRY.size)
+            if entry_hash != target:
+                break
+            line = self.results[offset:offset + length]
+            if json.loads(line).get("key") == key:
+                return line
+            i += 1
+        return None
+
+
+class _HashColumn:
+    """Sequence view of the hash column of an index for bisect"""
+
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return ENTRY.unpack_from(self.index, HEADER.size + i * ENTRY.size)[0]
+
+
+def cli_key_candidates(text):
+    """Keys a command-line key may stand for: its JSON value first, then the raw string
+
+    Keys of results are arbitrary JSON values, while command-line arguments
+    are always strings, so "5" finds the key 5 as well as the key "5".
+    """
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return [text]
+    return [value, text] if value != text else [text]
+
+
+def get_main_with_args(args):
+    """Print the result lines of the given keys"""
+    if not os.path.exists(args.results_file):
+        print(f"Error: Results file not found: {args.results_file}", file=sys.stderr)
+        sys.exit(1)
+
+    missing = 0
+    with ResultIndex(args.results_file) as index:
+        for key in args.keys:
+            line = None
+            for candidate in cli_key_candidates(key):
+                line = index.get(candidate)
+                if line is not None:
+                    break
+            if line is None:
+                print(f"Error: Key not found: {key}", file=sys.stderr)
+                missing += 1
+            else:
+                sys.stdout.write(line.decode("utf-8") + "\n")
+
+    if missing:
+        sys.exit(1)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Inline batch requests for small inputs and their results
+"""
+
+import json
+import os
+
+# Request fields of a JSONL input line and the GenerateContentConfig field they map to
+CONFIG_FIELDS = {
+    "system_instruction": "system_instruction",
+    "systemInstruction": "system_instruction",
+    "tools": "tools",
+    "tool_config": "tool_config",
+    "toolConfig": "tool_config",
+    "safety_settings": "safety_settings",
+    "safetySettings": "safety_settings",
+    "cached_content": "cached_content",
+    "cachedContent": "cached_content",
+}
+GENERATION_CONFIG_FIELDS = ["generation_config", "generationConfig"]
+# SDK-only response fields that are not part of the REST response in result files
+SDK_RESPONSE_FIELDS = {"sdk_http_response", "automatic_function_calling_history", "parsed"}
+
+
+def to_inline_request(request):
+    """Convert a JSONL request to an inline request dict, or None if unsupported
+
+    The generation config and the other request options are merged into
+    the request's config, as batches.create expects for inline requests.
+    """
+    if not isinstance(request, dict) or "contents" not in request:
+        return None
+    config = {}
+    for name, value in request.items():
+        if name == "contents":
+            continue
+        if name in GENERATION_CONFIG_FIELDS:
+            if not isinstance(value, dict):
+                return None
+            config.update(value)
+        elif name in CONFIG_FIELDS:
+            config[CONFIG_FIELDS[name]] = value
+        else:
+            return None
+    inline_request = {"contents": request["contents"]}
+    if config:
+        inline_request["config"] = config
+    return inline_request
+
+
+def load_inline_requests(input_file, max_bytes):
+    """Read an input file as inline requests, return None if it should be uploaded
+
+    Files larger than max_bytes, and files with requests that cannot be
+    expressed inline, are submitted as uploaded files instead.
+    """
+    if not max_bytes or os.path.getsize(input_file) > max_bytes:
+        return None
+    requests = []
+    with open(input_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            inline_request = to_inline_request(json.loads(line).get("request"))
+            if inline_request is None:
+                return None
+            requests.append(inline_request)
+    return requests or None
+
+
+def dump_model(value, exclude=None):
+    """JSON-compatible dict of an SDK object with REST (camelCase) field names"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", by_alias=True, exclude_none=True, exclude=exclude)
+    return value
+
+
+def write_inline_results(batch_job, input_file, stream):
+    """Write the inline responses of a batch job to a binary stream as result lines
+
+    Inline responses come back in request order, so they are paired with
+    the keys of the input file in order, giving the same format as
+    downloaded result files.
+    """
+    responses = list(batch_job.dest.inlined_responses or [])
+    with open(input_file, "r", encoding="utf-8") as f:
+        keys = [json.loads(line).get("key") for line in f if line.strip()]
+    if len(keys) != len(responses):
+        raise ValueError(f"{len(responses)} inline responses for {len(keys)} requests in {input_file}")
+    for key, item in zip(keys, responses):
+        record = {"key": key}
+        if item.response is not None:
+            record["response"] = dump_model(item.response, exclude=SDK_RESPONSE_FIELDS)
+        else:
+            record["error"] = dump_model(item.error)
+        stream.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Pluggable job stores: JSONL (AtomicJobManager) and SQLite
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from gembatch.batch_info import FORMAT_VERSION, COMPLETED_STATES, AtomicJobManager, write_format_version
+from gembatch.metrics import metrics
+from gembatch.profiling import span
+
+STORE_TYPES = ['jsonl', 'sqlite']
+SQLITE_SUFFIXES = ['.db', '.sqlite', '.sqlite3']
+QUERY_CHUNK = 500  # Batch names per IN query, below SQLite's bound parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_file TEXT NOT NULL,
+    batch_name TEXT,
+    state TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_input_file ON jobs (input_file);
+CREATE INDEX IF NOT EXISTS jobs_batch_name ON jobs (batch_name);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+def is_sqlite_store(job_info_file):
+    """Check whether a job info path refers to a SQLite store"""
+    return Path(job_info_file).suffix.lower() in SQLITE_SUFFIXES
+
+
+def resolve_job_info_path(job_info_file, store=None):
+    """Return the job info path for the requested store type
+
+    Selecting the SQLite store for a path without a SQLite extension
+    switches it to a .db suffix, so `--store sqlite` alone uses job-info.db.
+    """
+    if store == 'sqlite' and not is_sqlite_store(job_info_file):
+        return str(Path(job_info_file).with_suffix('.db'))
+    return job_info_file
+
+
+def open_job_manager(job_info_file, client=None, **kwargs):
+    """Open the job manager matching the job info file type"""
+    if is_sqlite_store(job_info_file):
+        kwargs.pop('retry_interval', None)
+        kwargs.pop('compact_threshold', None)
+        return SqliteJobManager(job_info_file, **kwargs)
+    return AtomicJobManager(job_info_file, client, **kwargs)
+
+
+def _file_signature(path):
+    """Identity, size and modification time of a file, or None if missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class JobInfoWatcher:
+    """In-memory view of a job info store that rereads only what changed
+
+    For a JSONL store, changes are detected by comparing the signatures
+    (inode, size and mtime) of the base and journal files, which costs a
+    stat call per file. Records appended to the journal are read from the
+    last known offset without taking the lock; any other change (a rewritten
+    base file or journal compaction) reloads the store. For a SQLite store,
+    PRAGMA data_version on a connection kept open by the watcher reports
+    commits by other connections. After the first read, only pending jobs,
+    jobs that were pending when last read and jobs added since are queried,
+    because completed records no longer change.
+    """
+
+    def __init__(self, job_info_file, client=None):
+        self.job_info_file = job_info_file
+        self.client = client
+        self.jobs = {}  # batch name -> job, in first-seen order
+        self.sqlite = is_sqlite_store(job_info_file)
+        self.journal_file = f"{job_info_file}.journal"
+        self.conn = None
+        self.signatures = None
+        self.journal_offset = 0
+        self.last_row_id = None  # Highest SQLite row id read, None before the first read
+
+    def _signatures(self):
+        if not self.sqlite:
+            return [_file_signature(self.job_info_file), _file_signature(self.journal_file)]
+        if self.conn is None:
+            if not os.path.exists(self.job_info_file):
+                return None
+            self.conn = sqlite3.connect(self.job_info_file, isolation_level=None, check_same_thread=False)
+        return [self.conn.execute("PRAGMA data_version").fetchone()[0]]
+
+    def changed(self):
+        """Check whether the store changed since it was last read"""
+        return self._signatures() != self.signatures
+
+    def get_all_jobs(self):
+        """Jobs currently known, in job info order"""
+        return list(self.jobs.values())
+
+    def get_pending_jobs(self):
+        """Incomplete jobs currently known, in job info order"""
+        return [job for job in self.jobs.values() if job.get('batch', {}).get('state') not in COMPLETED_STATES]
+
+    def refresh(self):
+        """Bring the in-memory jobs up to date, return 'full', 'pending', 'append' or None"""
+        signatures = self._signatures()
+        if signatures == self.signatures:
+            return None
+        if self._can_tail_journal(signatures):
+            self._read_journal_tail(signatures)
+            return 'append'
+        return self._reload()
+
+    def close(self):
+        """Close the connection used to watch a SQLite store"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _can_tail_journal(self, signatures):
+        if self.signatures is None or self.sqlite:
+            return False
+        old_journal, journal = self.signatures[1], signatures[1]
+        # Same base file and same journal file that only grew
+        return (signatures[0] == self.signatures[0] and old_journal is not None and journal is not None and
+                journal[0] == old_journal[0] and journal[1] >= self.journal_offset)
+
+    def _read_journal_tail(self, signatures):
+        with open(self.journal_file, "rb") as f:
+            f.seek(self.journal_offset)
+            data = f.read()
+        # A record still being written is read once it is complete
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    job = json.loads(line)['job']
+                except (ValueError, KeyError):
+                    continue
+                self.jobs[job.get('batch', {}).get('name')] = job
+        self.journal_offset += end
+        self.signatures = signatures
+
+    def _reload(self):
+        if self.sqlite and self.last_row_id is not None:
+            self._reload_pending()
+            return 'pending'
+        with open_job_manager(self.job_info_file, self.client) as manager:
+            jobs = manager.get_all_jobs()
+            if self.sqlite:
+                self.last_row_id = manager.get_last_row_id()
+            # Writers are blocked while the lock is held, so these signatures
+            # match the data just read
+            self.signatures = self._signatures()
+        journal = None if self.sqlite else self.signatures[1]
+        self.journal_offset = journal[1] if journal else 0
+        self.jobs = {job.get('batch', {}).get('name'): job for job in jobs}
+        return 'full'
+
+    def _reload_pending(self):
+        """Update a SQLite view without reading the completed history again"""
+        known_pending = {job.get('batch', {}).get('name') for job in self.get_pending_jobs()}
+        with open_job_manager(self.job_info_file, self.client) as manager:
+            # New jobs come first so that they are added in job info order
+            jobs = manager.get_jobs_after(self.last_row_id)
+            pending = manager.get_pending_jobs()
+            # Jobs completed since the last read drop out of the pending query
+            known_pending.difference_update(job.get('batch', {}).get('name') for job in pending)
+            jobs += pending + manager.find_jobs_by_batch_names(known_pending)
+            self.last_row_id = manager.get_last_row_id()
+            self.signatures = self._signatures()
+        for job in jobs:
+            self.jobs[job.get('batch', {}).get('name')] = job
+
+
+class SqliteJobManager:
+    """SQLite job store with the same interface as AtomicJobManager
+
+    Each context is one transaction. Writers take the database write lock
+    up front (BEGIN IMMEDIATE), while WAL mode lets readers proceed without
+    waiting for them. Jobs are stored as JSON records next to indexed
+    input file, batch name and state columns, so lookups and pending-job
+    queries never read the completed history.
+    """
+
+    def __init__(self, job_info_file, timeout=30, read_only=False):
+        self.job_info_file = job_info_file
+        self.timeout = timeout
+        self.read_only = read_only
+        self.conn = None
+        self.modifications_made = False
+        self.lock_wait_time = 0.0
+
+    def __enter__(self):
+        """Open the database and start a transaction"""
+        self.conn = sqlite3.connect(self.job_info_file, timeout=self.timeout, isolation_level=None)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            start_time = time.monotonic()
+            with span("lock", file=self.job_info_file):
+                self.conn.execute("BEGIN" if self.read_only else "BEGIN IMMEDIATE")
+            self.lock_wait_time = time.monotonic() - start_time
+            self.lock_acquired_at = time.monotonic()
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            if "locked" in str(e):
+                raise TimeoutError(f"Could not acquire lock on {self.job_info_file} within {self.timeout} seconds")
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Commit on success, roll back on error"""
+        try:
+            if exc_type is None and not self.read_only:
+                with span("save", file=self.job_info_file):
+                    self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+        finally:
+            self.conn.close()
+            self.conn = None
+            metrics.observe("gembatch_job_info_lock_wait_seconds", self.lock_wait_time, store="sqlite")
+            metrics.observe("gembatch_job_info_lock_hold_seconds", time.monotonic() - self.lock_acquired_at,
+                            store="sqlite")
+
+    def _query(self, where="", params=(), limit=""):
+        rows = self.conn.execute(f"SELECT record FROM jobs {where} ORDER BY id {limit}", params)
+        return [json.loads(record) for (record,) in rows]
+
+    def find_jobs_by_batch_names(self, batch_names):
+        """Find jobs by batch names, in chunks below SQLite's parameter limit"""
+        batch_names = list(batch_names)
+        jobs = []
+        for i in range(0, len(batch_names), QUERY_CHUNK):
+            chunk = batch_names[i:i + QUERY_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            jobs += self._query(f"WHERE batch_name IN ({placeholders})", tuple(chunk))
+        return jobs
+
+    def get_jobs_after(self, row_id):
+        """Get jobs added after a row id returned by get_last_row_id"""
+        return self._query("WHERE id > ?", (row_id,))
+
+    def get_last_row_id(self):
+        """Row id of the most recently added job, 0 for an empty store"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+
+    def file_exists(self, filepath):
+        """Check if file exists"""
+        return Path(filepath).exists()
+
+    def find_job_by_input_file(self, filename):
+        """Find job by input file name"""
+        jobs = self._query("WHERE input_file = ?", (filename,), "LIMIT 1")
+        return jobs[0] if jobs else None
+
+    def find_job_by_batch_name(self, batch_name):
+        """Find job by batch name"""
+        jobs = self._query("WHERE batch_name = ?", (batch_name,), "LIMIT 1")
+        return jobs[0] if jobs else None
+
+    def add_job(self, job_record):
+        """Add new job if not exists, return True if added, False if already exists"""
+        if self.read_only:
+            raise RuntimeError("Cannot add job in read-only mode")
+
+        if self.find_job_by_input_file(job_record.get('input_file')):
+            return False
+
+        batch = job_record.get('batch', {})
+        self.conn.execute(
+            "INSERT INTO jobs (input_file, batch_name, state, record) VALUES (?, ?, ?, ?)",
+            (job_record.get('input_file'), batch.get('name'), batch.get('state'),
+             json.dumps(job_record, ensure_ascii=False))
+        )
+        self.modifications_made = True
+        return True
+
+    def update_job_by_batch_name(self, job_record):
+        """Update job by batch name, return True if updated, False if not found"""
+        return self.bulk_update_jobs([job_record])
+
+    def bulk_update_jobs(self, job_list):
+        """Update multiple jobs efficiently"""
+        if self.read_only:
+            raise RuntimeError("Cannot update job in read-only mode")
+
+        updated_count = 0
+        for job_record in job_list:
+            batch = job_record.get('batch', {})
+            if not batch.get('name'):
+                continue
+            cursor = self.conn.execute(
+                "UPDATE jobs SET input_file = ?, state = ?, record = ? WHERE batch_name = ?",
+                (job_record.get('input_file'), batch.get('state'),
+                 json.dumps(job_record, ensure_ascii=False), batch['name'])
+            )
+            updated_count += cursor.rowcount > 0
+        if updated_count:
+            self.modifications_made = True
+        return updated_count > 0
+
+    def get_all_jobs(self):
+        """Get all jobs (for display purposes)"""
+        return self._query()
+
+    def get_pending_jobs(self):
+        """Get incomplete jobs without reading completed history"""
+        placeholders = ", ".join("?" for _ in COMPLETED_STATES)
+        return self._query(f"WHERE state IS NULL OR state NOT IN ({placeholders})", tuple(COMPLETED_STATES))
+
+    def was_converted(self):
+        """SQLite stores only hold converted records"""
+        return False
+
+
+def import_main_with_args(args, client):
+    """Import jobs from a JSONL job info file into the --job-info store"""
+    if not os.path.exists(args.source):
+        print(f"Error: Job info file not found: {args.source}", file=sys.stderr)
+        sys.exit(1)
+
+    # Legacy records are converted while reading the JSONL file
+    with AtomicJobManager(args.source, client, read_only=True) as source:
+        jobs = source.get_all_jobs()
+
+    added = 0
+    with open_job_manager(args.job_info, client) as manager:
+        for job in jobs:
+            if manager.add_job(job):
+                added += 1
+            else:
+                # Refresh records already present in the store
+                manager.update_job_by_batch_name(job)
+
+    print(f"Imported {added} new jobs ({len(jobs) - added} existing) into {args.job_info}")
+
+
+def export_main_with_args(args, client):
+    """Export jobs from the --job-info store to a JSONL file"""
+    with open_job_manager(args.job_info, client, read_only=True) as manager:
+        jobs = manager.get_all_jobs()
+
+    out = sys.stdout if args.destination == '-' else open(args.destination, "w", encoding="utf-8")
+    try:
+        for job in jobs:
+            out.write(json.dumps(job, ensure_ascii=False) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.destination != '-':
+        # Exported records are converted, so the file is stamped as migrated
+        write_format_version(args.destination, FORMAT_VERSION)
+        print(f"Exported {len(jobs)} jobs to {args.destination}")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Stream-join input requests with their results into one JSONL output
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import sys
+import tempfile
+import zlib
+from gembatch.batch_info import get_result_path
+
+PROJECTIONS = ['full', 'text', 'json']
+DEFAULT_JOIN_MEMORY = 256 * 1024 * 1024  # Bytes of result lines held per hash partition
+MEMORY_OVERHEAD = 4  # In-memory size of a parsed result line relative to its JSON
+MAX_PARTITIONS = 256  # Partition files per split, which are open at the same time
+MAX_SPLIT_DEPTH = 4  # Times a partition is split again while it exceeds the memory budget
+
+
+def response_text(response):
+    """Concatenate the text parts of the first candidate of a response"""
+    try:
+        parts = response["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return "".join(part.get("text", "") for part in parts if not part.get("thought"))
+
+
+def project_record(key, request, result, projection='full'):
+    """Build an output record from a request and its result (None if missing)"""
+    record = {"key": key, "request": request}
+    result = dict(result or {"response": None})
+    result.pop("key", None)
+    response = result.pop("response", None)
+    if projection == 'text':
+        record["text"] = response_text(response) if response else None
+    elif projection == 'json':
+        text = response_text(response) if response else None
+        try:
+            record["json"] = json.loads(text) if text else None
+        except ValueError:
+            record["json"] = None
+    else:
+        record["response"] = response
+    # Keep error or status fields reported instead of a response
+    record.update(result)
+    return record
+
+
+def _read_line(f):
+    """Read the next non-empty line, return (offset, line) or (offset, None) at EOF"""
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            return offset, None
+        if line.strip():
+            return offset, line
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def merge_ordered(input_f, result_f, out, projection):
+    """Join lines pairwise while keys align
+
+    Returns (joined count, mismatch), where mismatch is the pair of offsets
+    of the first lines whose keys differ, or None if both files were joined
+    completely.
+    """
+    joined = 0
+    while True:
+        input_offset, input_line = _read_line(input_f)
+        result_offset, result_line = _read_line(result_f)
+        if input_line is None and result_line is None:
+            return joined, None
+        if input_line is None or result_line is None:
+            return joined, (input_offset, result_offset)
+        data = json.loads(input_line)
+        result = json.loads(result_line)
+        if data.get("key") != result.get("key"):
+            return joined, (input_offset, result_offset)
+        out.write(_dump(project_record(data.get("key"), data.get("request"), result, projection)))
+        joined += 1
+
+
+def _partition(key, partitions, level=0):
+    """Partition of a key; each level hashes independently of the others"""
+    data = json.dumps(key).encode("utf-8")
+    if level == 0:
+        return zlib.crc32(data) % partitions
+    digest = hashlib.blake2b(data, digest_size=8, salt=bytes([level])).digest()
+    return int.from_bytes(digest, "big") % partitions
+
+
+def _partition_count(size, memory):
+    """Partitions needed for size bytes of result lines to fit memory, at most MAX_PARTITIONS"""
+    return min(MAX_PARTITIONS, max(1, math.ceil(size * MEMORY_OVERHEAD / memory)))
+
+
+def _spill(f, paths, level, tag=False, tagged=False):
+    """Distribute the lines of f over partition files by key
+
+    With tag, lines are prefixed with their line number; tagged lines
+    already carry one.
+    """
+    files = [open(path, "wb") for path in paths]
+    try:
+        seq = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            if tag:
+                line = b"%d\t%s" % (seq, line)
+                seq += 1
+            if len(files) == 1:
+                files[0].write(line)
+                continue
+            data = line.split(b"\t", 1)[1] if tag or tagged else line
+            files[_partition(json.loads(data).get("key"), len(files), level)].write(line)
+    finally:
+        for part in files:
+            part.close()
+
+
+def _merge_tagged(paths, out, strip_tags):
+    """Merge files of tagged lines, each in line number order, into out"""
+    files = [open(path, "rb") for path in paths]
+    try:
+        merged = heapq.merge(*files, key=lambda line: int(line.split(b"\t", 1)[0]))
+        for line in merged:
+            out.write(line.split(b"\t", 1)[1] if strip_tags else line)
+    finally:
+        for f in files:
+            f.close()
+
+
+def _join_partition(input_path, result_path, joined_path, projection, memory, level, counts):
+    """Join one partition into joined_path as tagged lines in input order
+
+    A partition whose results still exceed the memory budget is split again
+    with the hash of the next level and its parts are joined recursively.
+    The partition files are removed once they have been read.
+    """
+    partitions = _partition_count(os.path.getsize(result_path), memory)
+    if partitions > 1 and level < MAX_SPLIT_DEPTH:
+        parts = [(f"{input_path}.{i}", f"{result_path}.{i}", f"{joined_path}.{i}") for i in range(partitions)]
+        with open(result_path, "rb") as f:
+            _spill(f, [part[1] for part in parts], level)
+        os.remove(result_path)
+        with open(input_path, "rb") as f:
+            _spill(f, [part[0] for part in parts], level, tagged=True)
+        os.remove(input_path)
+        for part in parts:
+            _join_partition(*part, projection, memory, level + 1, counts)
+        with open(joined_path, "wb") as out:
+            _merge_tagged([part[2] for part in parts], out, False)
+        for part in parts:
+            os.remove(part[2])
+        return
+
+    results = {}
+    with open(result_path, "rb") as f:
+        for line in f:
+            result = json.loads(line)
+            results[result.get("key")] = result
+    os.remove(result_path)
+
+    with open(input_path, "rb") as f, open(joined_path, "wb") as out:
+        for line in f:
+            seq, line = line.split(b"\t", 1)
+            data = json.loads(line)
+            result = results.pop(data.get("key"), None)
+            if result is None:
+                counts["unmatched"] += 1
+            else:
+                counts["joined"] += 1
+            record = project_record(data.get("key"), data.get("request"), result, projection)
+            out.write(seq + b"\t" + _dump(record))
+    os.remove(input_path)
+    counts["orphaned"] += len(results)
+
+
+def hash_join(input_f, result_f, out, projection, tmp_dir, memory=DEFAULT_JOIN_MEMORY):
+    """Join the rest of both files by key through hash partitions spilled to disk
+
+    Result lines are partitioned by key so that each partition fits in
+    memory. Input lines are partitioned the same way, tagged with their
+    line number, and the joined partitions are merged back into input order.
+    At most MAX_PARTITIONS partition files are open at once; partitions
+    that are still too large are split again. Returns (joined count, inputs
+    without result, results without input).
+    """
+    remaining = os.fstat(result_f.fileno()).st_size - result_f.tell()
+    partitions = _partition_count(remaining, memory)
+    parts = [tuple(os.path.join(tmp_dir, f"{prefix}-{i}") for prefix in ("input", "results", "joined"))
+             for i in range(partitions)]
+    _spill(result_f, [part[1] for part in parts], 0)
+    _spill(input_f, [part[0] for part in parts], 0, tag=True)
+
+    counts = {"joined": 0, "unmatched": 0, "orphaned": 0}
+    for part in parts:
+        _join_partition(*part, projection, memory, 1, counts)
+
+    # Each joined partition is in input order; merge them by line number
+    _merge_tagged([part[2] for part in parts], out, True)
+    return counts["joined"], counts["unmatched"], counts["orphaned"]
+
+
+def join_files(input_file, result_file, out, projection='full', memory=DEFAULT_JOIN_MEMORY, tmp_dir=None):
+    """Join an input file with its results, writing records to a binary stream
+
+    Returns a summary dict with the joined and unmatched counts.
+    """
+    summary = {"ordered": 0, "joined": 0, "unmatched": 0, "orphaned": 0}
+    with open(input_file, "rb") as input_f, open(result_file, "rb") as result_f:
+        ordered, mismatch = merge_ordered(input_f, result_f, out, projection)
+        summary["ordered"] = summary["joined"] = ordered
+        if mismatch is None:
+            return summary
+        input_f.seek(mismatch[0])
+        result_f.seek(mismatch[1])
+        with tempfile.TemporaryDirectory(prefix="gembatch-join-", dir=tmp_dir) as spill_dir:
+            joined, unmatched, orphaned = hash_join(input_f, result_f, out, projection, spill_dir, memory)
+        summary["joined"] = ordered + joined
+        summary["unmatched"] = unmatched
+        summary["orphaned"] = orphaned
+    return summary
+
+
+def main_with_args(args):
+    """Join an input file with its results and write the records"""
+    result_file = args.results_file or str(get_result_path(args.input_file))
+    for path in (args.input_file, result_file):
+        if not os.path.exists(path):
+            print(f"Error: File not found: {path}", file=sys.stderr)
+            sys.exit(1)
+
+    out = sys.stdout.buffer if args.output == '-' else open(args.output, "wb")
+    try:
+        summary = join_files(args.input_file, result_file, out, args.project, args.memory, args.tmp_dir)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+
+    message = f"Joined {summary['joined']} records ({summary['ordered']} in order)"
+    if summary["unmatched"]:
+        message += f", {summary['unmatched']} requests without result"
+    if summary["orphaned"]:
+        message += f", {summary['orphaned']} results without request"
+    print(message, file=sys.stderr)
@@ -6,14 +6,63 @@ Main CLI entry point for Gemini Batch Tools
 import os
 import sys
 import argparse
-from google import genai
-from . import submit, poll, cleanup
-from . import __version__
+import threading
+from . import submit, poll, cleanup, job_store, join, migrate
+from .client import ENDPOINT_RATES, RATE_ENV_PREFIX, RateBudget, RateLimitedClient, default_budget_file
+from .client import configured_rates, parse_rate
+from .profiling import profile_session
+from .shard import parse_size
+from .cache import DEFAULT_CACHE_SIZE
+from .batch_info import AtomicJobManager
 
 DEFAULT_MODEL = "gemini-2.5-flash-lite-preview-06-17"
 DEFAULT_JOB_INFO_FILE = "job-info.jsonl"
 
 
+class VersionAction(argparse.Action):
+    """Print the version, reading package metadata only when requested"""
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help=None):
+        super().__init__(option_strings, dest=dest, default=default, nargs=0, help=help)
+    
+    def __call__(self, parser, namespace, values, option_string=None):
+        from . import __version__
+        print(f"{parser.prog} {__version__}")
+        parser.exit()
+
+
+def api_rate(spec):
+    """argparse type for --api-rate ENDPOINT=N"""
+    try:
+        return parse_rate(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+class LazyClient:
+    """Gemini client proxy that imports the SDK and connects on first use
+    
+    Commands that finish without calling the API (e.g. polling an already
+    completed job-info) never pay for importing google.genai.
+    """
+    def __init__(self, api_key):
+        self._api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+    
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client(
+                    api_key=self._api_key,
+                    http_options={"api_version": "v1alpha"}
+                )
+            return self._client
+    
+    def __getattr__(self, name):
+        return getattr(self._get_client(), name)
+
+
 def create_parser():
     """Create the main argument parser with subcommands"""
     parser = argparse.ArgumentParser(
@@ -24,8 +73,8 @@ def create_parser():
     # Version argument
     parser.add_argument(
         '--version',
-        action='version',
-        version=f'%(prog)s {__version__}'
+        action=VersionAction,
+        help="show program's version number and exit"
     )
     
     # Global arguments
@@ -34,6 +83,38 @@ def create_parser():
         default=DEFAULT_JOB_INFO_FILE,
         help=f'JSONL file to store/read job information (default: {DEFAULT_JOB_INFO_FILE})'
     )
+    parser.add_argument(
+        '--store',
+        choices=job_store.STORE_TYPES,
+        help='Job info store type (default: by --job-info extension; '
+             'sqlite uses a .db file for --job-info)'
+    )
+    parser.add_argument(
+        '--journal',
+        action='store_true',
+        help='Enable append-only journal mode for the job info file (persists once enabled)'
+    )
+    parser.add_argument(
+        '--api-rate',
+        type=api_rate,
+        action='append',
+        default=[],
+        metavar='ENDPOINT=N',
+        help='Requests per second for an API endpoint, 0 for no limit; repeatable '
+             f'(also {RATE_ENV_PREFIX}<ENDPOINT>; defaults: '
+             + ', '.join(f'{name}={rate:g}' for name, rate in ENDPOINT_RATES.items()) + ')'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write timing spans of command phases (lock, load, convert, save, check, api, download, '
+             'cleanup, render) to FILE in Chrome trace format (Perfetto, chrome://tracing)'
+    )
+    parser.add_argument(
+        '--cprofile',
+        metavar='FILE',
+        help='Write a cProfile dump of the command to FILE (pstats, snakeviz)'
+    )
     
     subparsers = parser.add_subparsers(
         dest='command',
@@ -56,12 +137,120 @@ def create_parser():
         default=DEFAULT_MODEL,
         help=f'Gemini model to use (default: {DEFAULT_MODEL})'
     )
+    submit_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=submit.DEFAULT_WORKERS,
+        help=f'Concurrent uploads and batch creations (default: {submit.DEFAULT_WORKERS})'
+    )
+    submit_parser.add_argument(
+        '--shard-lines',
+        type=int,
+        help='Split inputs into shards of at most this many requests, submitted as separate jobs'
+    )
+    submit_parser.add_argument(
+        '--shard-bytes',
+        type=parse_size,
+        help='Split inputs into shards of at most this size (e.g. 200M), submitted as separate jobs'
+    )
+    submit_parser.add_argument(
+        '--inline-bytes',
+        type=parse_size,
+        help='Send inputs of at most this size (e.g. 100K) as inline requests instead of uploading them'
+    )
+    submit_parser.add_argument(
+        '--no-validate',
+        dest='validate',
+        action='store_false',
+        help='Skip checking input lines (JSON, key, request contents, generation config, duplicate keys) before upload'
+    )
+    submit_parser.add_argument(
+        '--cache-dir',
+        help='Reuse responses of identical requests from this cache directory and submit only the rest'
+    )
+    submit_parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help=f'Maximum cache size in megabytes before least recently used entries are evicted '
+             f'(default: {DEFAULT_CACHE_SIZE})'
+    )
     
     # Poll subcommand
     poll_parser = subparsers.add_parser(
         'poll',
         help='Poll batch jobs and download results when completed'
     )
+    poll_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=poll.DEFAULT_WORKERS,
+        help=f'Maximum concurrent status checks per poll cycle (default: {poll.DEFAULT_WORKERS})'
+    )
+    poll_parser.add_argument(
+        '--refresh',
+        choices=poll.REFRESH_MODES,
+        default='auto',
+        help='How to refresh job states: one batches.get per job, a paginated '
+             'batches.list sweep with per-job fallback, or auto, which sweeps when more than '
+             f'{poll.AUTO_LIST_THRESHOLD} jobs are due (default: auto)'
+    )
+    poll_parser.add_argument(
+        '--min-interval',
+        type=int,
+        default=poll.MIN_POLL_INTERVAL,
+        help=f'Shortest delay in seconds between checks of a job (default: {poll.MIN_POLL_INTERVAL})'
+    )
+    poll_parser.add_argument(
+        '--max-interval',
+        type=int,
+        default=poll.MAX_POLL_INTERVAL,
+        help=f'Longest delay in seconds between checks of a job (default: {poll.MAX_POLL_INTERVAL})'
+    )
+    poll_parser.add_argument(
+        '--download-workers',
+        type=int,
+        default=poll.DOWNLOAD_WORKERS,
+        help=f'Background workers downloading results (default: {poll.DOWNLOAD_WORKERS})'
+    )
+    poll_parser.add_argument(
+        '--rows',
+        type=int,
+        help='Job rows shown at once; longer lists page through the jobs (default: fit the terminal)'
+    )
+    poll_parser.add_argument(
+        '--render-interval',
+        type=float,
+        default=poll.RENDER_INTERVAL,
+        help=f'Minimum seconds between screen updates (default: {poll.RENDER_INTERVAL})'
+    )
+    poll_parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='Do not show the TUI; write JSONL events to standard output unless --events is given'
+    )
+    poll_parser.add_argument(
+        '--events',
+        metavar='FILE',
+        help="Append one JSON line per state change, download and cleanup to FILE "
+             "('-' for standard output with --headless)"
+    )
+    poll_parser.add_argument(
+        '--metrics-file',
+        metavar='FILE',
+        help='Write API, lock and throughput metrics in Prometheus text format to FILE periodically'
+    )
+    poll_parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve the same metrics over HTTP on localhost:PORT for Prometheus scrapes'
+    )
+    poll_parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Keep running after all jobs are done and pick up new submissions as they are recorded'
+    )
     
     # Cleanup subcommand
     cleanup_parser = subparsers.add_parser(
@@ -73,6 +262,124 @@ def create_parser():
         action='store_true',
         help='Skip confirmation prompt and delete all resources'
     )
+    cleanup_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=cleanup.DEFAULT_WORKERS,
+        help=f'Concurrent delete requests (default: {cleanup.DEFAULT_WORKERS})'
+    )
+    cleanup_parser.add_argument(
+        '--rate',
+        type=float,
+        help='Delete requests per second, 0 for no limit; sets the delete rate of the API budget '
+             '(default: --api-rate delete=N)'
+    )
+    cleanup_parser.add_argument(
+        '--job-info-only',
+        action='store_true',
+        help='Only delete files and batch jobs recorded in --job-info'
+    )
+    cleanup_parser.add_argument(
+        '--terminal-only',
+        action='store_true',
+        help='Only delete finished batch jobs, and keep the files of running ones'
+    )
+    cleanup_parser.add_argument(
+        '--older-than',
+        type=float,
+        metavar='HOURS',
+        help='Only delete resources created more than HOURS ago'
+    )
+    cleanup_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='List the resources that would be deleted without deleting them'
+    )
+    
+    # Import subcommand
+    import_parser = subparsers.add_parser(
+        'import',
+        help='Import jobs from a JSONL job info file into the --job-info store'
+    )
+    import_parser.add_argument(
+        'source',
+        help='JSONL job info file to import'
+    )
+    
+    # Export subcommand
+    export_parser = subparsers.add_parser(
+        'export',
+        help='Export jobs from the --job-info store as JSONL'
+    )
+    export_parser.add_argument(
+        'destination',
+        nargs='?',
+        default='-',
+        help='JSONL file to write (default: standard output)'
+    )
+    
+    # Migrate subcommand
+    migrate_parser = subparsers.add_parser(
+        'migrate',
+        help='Convert legacy job info records in one pass and stamp the format version'
+    )
+    migrate_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=migrate.DEFAULT_WORKERS,
+        help=f'Concurrent record conversions (default: {migrate.DEFAULT_WORKERS})'
+    )
+    
+    # Get subcommand
+    get_parser = subparsers.add_parser(
+        'get',
+        help='Print result lines by key using the results index'
+    )
+    get_parser.add_argument(
+        'results_file',
+        help='Results JSONL file (e.g. results/input.jsonl)'
+    )
+    get_parser.add_argument(
+        'keys',
+        nargs='+',
+        help='Request keys to look up'
+    )
+    
+    # Join subcommand
+    join_parser = subparsers.add_parser(
+        'join',
+        help='Join input requests with their results into one JSONL output'
+    )
+    join_parser.add_argument(
+        'input_file',
+        help='Input JSONL file'
+    )
+    join_parser.add_argument(
+        'results_file',
+        nargs='?',
+        help='Results JSONL file (default: results/ next to the input file)'
+    )
+    join_parser.add_argument(
+        '-o', '--output',
+        default='-',
+        help='JSONL file to write (default: standard output)'
+    )
+    join_parser.add_argument(
+        '--project',
+        choices=join.PROJECTIONS,
+        default='full',
+        help='Output the full response, only its text, or its text parsed as structured-output JSON (default: full)'
+    )
+    join_parser.add_argument(
+        '--memory',
+        type=parse_size,
+        default=join.DEFAULT_JOIN_MEMORY,
+        help='Memory budget for joining unaligned files, which spill to disk beyond it (e.g. 1G, default: 256M)'
+    )
+    join_parser.add_argument(
+        '--tmp-dir',
+        help='Directory for spill files (default: system temporary directory)'
+    )
     
     return parser
 
@@ -86,21 +393,49 @@ def main():
         parser.print_help()
         sys.exit(1)
     
+    # Profiles are written when the command ends, also when it fails
+    with profile_session(args.profile, args.cprofile):
+        return run_command(args)
+
+
+def run_command(args):
+    """Run the selected subcommand"""
+    # Local commands do not need the API
+    if args.command == 'get':
+        from . import index
+        index.get_main_with_args(args)
+        return
+    if args.command == 'join':
+        join.main_with_args(args)
+        return
+    
     # Check Gemini API key
     if "GEMINI_API_KEY" not in os.environ:
         print("Error: GEMINI_API_KEY environment variable not set", file=sys.stderr)
         sys.exit(1)
     
-    # Initialize Gemini client
     try:
-        client = genai.Client(
-            api_key=os.environ["GEMINI_API_KEY"],
-            http_options={"api_version": "v1alpha"}
-        )
-    except Exception as e:
-        print(f"Error: Failed to initialize Gemini client: {e}", file=sys.stderr)
+        rates = configured_rates(args.api_rate)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
     
+    # The Gemini client is created when the first API call is made; every
+    # call is rate limited by a budget shared with other gembatch processes
+    api_key = os.environ["GEMINI_API_KEY"]
+    budget = RateBudget(rates, state_file=default_budget_file(api_key))
+    client = RateLimitedClient(LazyClient(api_key), budget)
+    
+    args.job_info = job_store.resolve_job_info_path(args.job_info, args.store)
+    
+    # Journal mode is a property of the job info file: once the journal
+    # exists, every command appends changes to it. It is created under the
+    # job info lock, since its header has to match the base file.
+    if (args.journal and not job_store.is_sqlite_store(args.job_info) and
+            not os.path.exists(f"{args.job_info}.journal")):
+        with AtomicJobManager(args.job_info, read_only=True, enable_journal=True):
+            pass
+    
     try:
         if args.command == 'submit':
             return submit.main_with_args(args, client)
@@ -108,6 +443,12 @@ def main():
             return poll.main_with_args(args, client)
         elif args.command == 'cleanup':
             return cleanup.main_with_args(args, client)
+        elif args.command == 'import':
+            return job_store.import_main_with_args(args, client)
+        elif args.command == 'export':
+            return job_store.export_main_with_args(args, client)
+        elif args.command == 'migrate':
+            return migrate.main_with_args(args, client)
         else:
             print(f"Unknown command: {args.command}", file=sys.stderr)
             sys.exit(1)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Process-wide metrics for API calls, job-info locking and job throughput
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+JOB_DURATION_BUCKETS = (300, 900, 1800, 3600, 7200, 14400, 28800, 43200, 86400, 172800)  # Seconds
+SNAPSHOT_INTERVAL = 15.0  # Seconds between metrics file snapshots
+
+METRIC_HELP = {
+    "gembatch_api_requests_total": ("counter", "API call attempts by endpoint and outcome"),
+    "gembatch_api_latency_seconds": ("histogram", "API call attempt latency by endpoint"),
+    "gembatch_api_budget_wait_seconds": ("histogram", "Time spent waiting for the rate limit budget"),
+    "gembatch_job_info_lock_wait_seconds": ("histogram", "Time spent waiting for the job info lock"),
+    "gembatch_job_info_lock_hold_seconds": ("histogram", "Time the job info lock was held"),
+    "gembatch_uploaded_bytes_total": ("counter", "Bytes of input files uploaded"),
+    "gembatch_downloaded_bytes_total": ("counter", "Bytes of result files downloaded"),
+    "gembatch_jobs_completed_total": ("counter", "Batch jobs that reached a terminal state, by state"),
+    "gembatch_requests_completed_total": ("counter", "Requests of successfully completed batch jobs"),
+    "gembatch_job_duration_seconds": ("histogram", "Time from job creation to its end"),
+    "gembatch_uptime_seconds": ("gauge", "Seconds since the process started collecting metrics"),
+    "gembatch_jobs_completed_per_hour": ("gauge", "Completed jobs per hour of uptime"),
+    "gembatch_requests_completed_per_hour": ("gauge", "Completed requests per hour of uptime"),
+}
+
+
+def format_labels(labels):
+    """Render a sorted label tuple in Prometheus syntax"""
+    if not labels:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Cumulative bucket counts, sum, count and maximum of observed values"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters and histograms
+
+    Metrics are created on first use; labels are passed as keyword
+    arguments. render() produces the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard all values and restart the uptime"""
+        with self.lock:
+            self.counters = {}  # (name, labels) -> value
+            self.histograms = {}  # (name, labels) -> Histogram
+            self.start_time = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Record a value in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def total(self, name, **labels):
+        """Sum of a counter over all label sets matching labels"""
+        wanted = set(labels.items())
+        with self.lock:
+            return sum(value for (key_name, key_labels), value in self.counters.items()
+                       if key_name == name and wanted <= set(key_labels))
+
+    def histogram(self, name, **labels):
+        """Histogram of a name merged over all label sets matching labels, or None"""
+        wanted = set(labels.items())
+        merged = None
+        with self.lock:
+            for (key_name, key_labels), histogram in self.histograms.items():
+                if key_name != name or not wanted <= set(key_labels):
+                    continue
+                if merged is None:
+                    merged = Histogram(histogram.buckets)
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.sum += histogram.sum
+                merged.count += histogram.count
+                merged.max = max(merged.max, histogram.max)
+        return merged
+
+    def label_values(self, name, label):
+        """Sorted values of a label used by a counter or histogram"""
+        with self.lock:
+            keys = list(self.counters) + list(self.histograms)
+        return sorted({value for key_name, key_labels in keys if key_name == name
+                       for label_name, value in key_labels if label_name == label})
+
+    def uptime(self):
+        return time.monotonic() - self.start_time
+
+    def render(self):
+        """Prometheus text exposition of all metrics"""
+        uptime = self.uptime()
+        hours = max(uptime, 1.0) / 3600
+        gauges = {
+            "gembatch_uptime_seconds": uptime,
+            "gembatch_jobs_completed_per_hour": self.total("gembatch_jobs_completed_total") / hours,
+            "gembatch_requests_completed_per_hour": self.total("gembatch_requests_completed_total") / hours,
+        }
+        with self.lock:
+            samples = {}  # name -> list of sample lines
+            for (name, labels), value in sorted(self.counters.items()):
+                samples.setdefault(name, []).append(f"{name}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                lines = samples.setdefault(name, [])
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        for name, value in gauges.items():
+            samples[name] = [f"{name} {value:.3f}"]
+
+        output = []
+        for name, lines in samples.items():
+            kind, description = METRIC_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def summary(self):
+        """Human-readable summary lines of API calls, transfers and locking"""
+        lines = []
+        endpoints = self.label_values("gembatch_api_requests_total", "endpoint")
+        if endpoints:
+            lines.append("API calls:")
+        for endpoint in endpoints:
+            calls = self.total("gembatch_api_requests_total", endpoint=endpoint)
+            errors = self.total("gembatch_api_requests_total", endpoint=endpoint, outcome="error")
+            retries = self.total("gembatch_api_requests_total", endpoint=endpoint, outcome="retry")
+            latency = self.histogram("gembatch_api_latency_seconds", endpoint=endpoint)
+            waited = self.histogram("gembatch_api_budget_wait_seconds", endpoint=endpoint)
+            line = f"  {endpoint:<9} {calls} calls, {errors} errors, {retries} retries"
+            if latency and latency.count:
+                line += f", avg {latency.sum / latency.count:.2f}s, max {latency.max:.2f}s"
+            if waited and waited.sum >= 0.01:
+                line += f", rate limited {waited.sum:.2f}s"
+            lines.append(line)
+        uploaded = self.total("gembatch_uploaded_bytes_total")
+        downloaded = self.total("gembatch_downloaded_bytes_total")
+        if uploaded or downloaded:
+            lines.append(f"Transferred: {uploaded / 1024 / 1024:.1f} MB uploaded, "
+                         f"{downloaded / 1024 / 1024:.1f} MB downloaded")
+        wait = self.histogram("gembatch_job_info_lock_wait_seconds")
+        hold = self.histogram("gembatch_job_info_lock_hold_seconds")
+        if wait and hold:
+            lines.append(f"Job info lock: {hold.count} transactions, waited {wait.sum:.2f}s "
+                         f"(max {wait.max:.2f}s), held {hold.sum:.2f}s (max {hold.max:.2f}s)")
+        return lines
+
+
+metrics = Metrics()  # Registry shared by all modules of this process
+
+
+def write_snapshot(path, registry=None):
+    """Atomically replace path with the current metrics in Prometheus text format"""
+    registry = registry or metrics
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(registry.render())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SnapshotWriter:
+    """Background thread writing a metrics snapshot file every interval
+
+    The file can be read by the node_exporter textfile collector or by
+    scripts; stop() writes a final snapshot.
+    """
+
+    def __init__(self, path, interval=SNAPSHOT_INTERVAL, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or metrics
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                write_snapshot(self.path, self.registry)
+            except OSError:
+                # Retried at the next interval
+                pass
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        write_snapshot(self.path, self.registry)
+
+
+def serve_metrics(port, host="127.0.0.1", registry=None):
+    """Serve the metrics over HTTP on a background thread, return the server
+
+    Any path returns the Prometheus text format; call shutdown() to stop.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes would otherwise be logged over the TUI
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Convert legacy job-info records in one pass and stamp the format version
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from gembatch.batch_info import AtomicJobManager, convert_job_if_needed, needs_conversion
+from gembatch.job_store import is_sqlite_store
+
+DEFAULT_WORKERS = 8  # Concurrent legacy record conversions
+
+
+def convert_jobs(client, jobs, max_workers=DEFAULT_WORKERS):
+    """Convert legacy records concurrently
+
+    Returns (converted, failures): converted maps input file names to
+    converted records, failures maps input file names to the exception
+    raised while converting them.
+    """
+    converted = {}
+    failures = {}
+    if not jobs:
+        return converted, failures
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        futures = {job['input_file']: executor.submit(convert_job_if_needed, client, job) for job in jobs}
+        for input_file, future in futures.items():
+            try:
+                converted[input_file] = future.result()
+            except Exception as e:
+                failures[input_file] = e
+    return converted, failures
+
+
+def main_with_args(args, client):
+    """Main function that accepts parsed arguments and initialized client"""
+    job_info_file = args.job_info
+    if is_sqlite_store(job_info_file):
+        print(f"Nothing to migrate: {job_info_file} is a SQLite store, which only holds converted records")
+        return
+    if not os.path.exists(job_info_file):
+        print(f"Error: Job info file not found: {job_info_file}", file=sys.stderr)
+        sys.exit(1)
+
+    # Read the records without converting them; the API calls and line
+    # counts run outside the lock so that other commands are not blocked
+    with AtomicJobManager(job_info_file, read_only=True) as manager:
+        if manager.format_version is not None:
+            print(f"Already migrated: {job_info_file} (format version {manager.format_version})")
+            return
+        legacy_jobs = [job for job in manager.get_all_jobs() if needs_conversion(job)]
+
+    print(f"Converting {len(legacy_jobs)} legacy records with {args.workers} workers")
+    converted, failures = convert_jobs(client, legacy_jobs, args.workers)
+    for input_file, error in failures.items():
+        print(f"Error: Failed to convert {input_file}: {error}", file=sys.stderr)
+
+    # Records added in the meantime are new-format; any legacy record not
+    # converted above is left as it is and blocks the version stamp
+    with AtomicJobManager(job_info_file) as manager:
+        remaining = manager.apply_migration(converted)
+
+    if remaining:
+        print(f"Error: {len(remaining)} legacy records remain in {job_info_file}; "
+              f"rerun migrate to retry them", file=sys.stderr)
+        sys.exit(1)
+    print(f"Migrated {len(converted)} records; {job_info_file} is stamped with format version "
+          f"{manager.format_version}")
+
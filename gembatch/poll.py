@@ -4,186 +4,44 @@ Poll job-info.jsonl for batch job status and download results when completed
 """
 
 import os
-import json
+import math
 import sys
 import time
-import argparse
-from datetime import datetime, timezone
-from pathlib import Path
-from google import genai
-from rich.live import Live
-from rich.table import Table
-from rich.columns import Columns
-from rich.align import Align
-from rich.console import Console, Group
-from rich.panel import Panel
-from rich.text import Text
-from gembatch.batch_info import batch_to_dict, AtomicJobManager
-
-POLL_INTERVAL = 30  # Poll every 30 seconds
-
-console = Console()
-
-
-def to_local_time(iso_time_str):
-    """Convert ISO time string to local time string"""
-    if not iso_time_str:
-        return ""
-    try:
-        # Parse ISO format and convert to local time
-        dt = datetime.fromisoformat(iso_time_str.replace('Z', '+00:00'))
-        local_dt = dt.astimezone()
-        return local_dt.strftime('%Y-%m-%d %H:%M:%S')
-    except Exception:
-        return iso_time_str[:19].replace('T', ' ')
-
-
-class JobStatusDisplay:
-    """Updatable job status display"""
-    def __init__(self, jobs, last_update, checking_job_index=None):
-        self.jobs = jobs
-        self.last_update = last_update
-        self.checking_job_index = checking_job_index
-        self.summary_text = Text()
-        self.last_update_text = Text(f"Last update: {last_update}", style="dim")
-        self.countdown_text = Text()
-        self._build_display()
-    
-    def _build_display(self):
-        # Build table
-        self.table = Table(title="Batch Job Monitor")
-        self.table.add_column("Input File", style="cyan")
-        self.table.add_column("Count", style="blue", justify="right")
-        self.table.add_column("State", style="magenta")
-        self.table.add_column("Create Time", style="dim")
-        self.table.add_column("End Time", style="green")
-        self.table.add_column("Duration", style="yellow", justify="right")
-        
-        completed_count = 0
-        for job_index, job in enumerate(self.jobs):
-            input_file = job['input_file']
-            count = job.get('count', 0)
-            batch = job['batch']
-            batch_state = batch.get('state', '')
-            
-            if batch_state in ['JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED']:
-                completed_count += 1
-                if batch_state == 'JOB_STATE_SUCCEEDED':
-                    status = "✓ Success"
-                    status_style = "green"
-                elif batch_state == 'JOB_STATE_FAILED':
-                    status = "✗ Failed"
-                    status_style = "red"
-                elif batch_state == 'JOB_STATE_CANCELLED':
-                    status = "⊘ Cancelled"
-                    status_style = "orange1"
-                else:
-                    status = "✓ Completed"
-                    status_style = "green"
-            else:
-                status = "⏳ Running"
-                # Check if this specific job is being checked
-                if self.checking_job_index == job_index:
-                    status_style = "white on red"
-                else:
-                    status_style = "yellow"
-            
-            # Extract times from batch object and convert to local time
-            create_time = batch.get('create_time', '')
-            end_time = batch.get('end_time', '')
-            created_at = to_local_time(create_time)
-            completed_at = to_local_time(end_time)
-            
-            # Calculate duration from create_time and end_time (or current time)
-            duration_display = ""
-            if create_time:
-                try:
-                    create_dt = datetime.fromisoformat(create_time.replace('Z', '+00:00'))
-                    if end_time:
-                        end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                    else:
-                        end_dt = datetime.now(timezone.utc)
-                    duration = end_dt - create_dt
-                    duration_sec = int(duration.total_seconds())
-                    
-                    hours = duration_sec // 3600
-                    minutes = (duration_sec % 3600) // 60
-                    seconds = duration_sec % 60
-                    duration_display = f"{hours}:{minutes:02d}:{seconds:02d}"
-                except Exception:
-                    duration_display = ""
-            
-            # Format count with comma separator
-            count_display = f"{count:,}" if count > 0 else ""
-            
-            self.table.add_row(
-                input_file,
-                count_display,
-                Text(status, style=status_style),
-                created_at,
-                completed_at,
-                duration_display
-            )
-        
-        # Build summary
-        total_jobs = len(self.jobs)
-        self.pending_jobs = total_jobs - completed_count
-        self._update_summary()
-    
-    def _update_summary(self, countdown=None, checking=False):
-        total_jobs = len(self.jobs)
-        completed_count = total_jobs - self.pending_jobs
-        
-        # Build combined summary and countdown text
-        self.summary_text.plain = ""
-        self.summary_text.append(f"Total jobs: {total_jobs} | ", style="bold")
-        self.summary_text.append(f"Completed: {completed_count} | ", style="green bold")
-        self.summary_text.append(f"Remaining: {self.pending_jobs}", style="yellow bold")
-        
-        # Add status or countdown
-        if checking:
-            self.summary_text.append(" | Checking status...", style="orange1 bold")
-        elif countdown is not None:
-            self.summary_text.append(f" | Next poll: {countdown}s", style="cyan")
-    
-    def update_countdown(self, countdown):
-        """Update only the countdown part"""
-        self._update_summary(countdown)
-    
-    def set_checking_status(self):
-        """Set checking status message and rebuild display"""
-        self._build_display()
-        if self.checking_job_index is not None:
-            self._update_summary(checking=True)
-        else:
-            self._update_summary()
-    
-    def __rich__(self):
-        panel_content = [
-            self.last_update_text,
-            Text(""),
-            self.table,
-            Text(""),
-            Align.left(self.summary_text)
-        ]
-        
-        if self.pending_jobs == 0:
-            panel_content.append(Text(""))
-            panel_content.append(Text("🎉 All jobs completed!", style="green bold"))
-        
-        return Panel(
-            Align.center(Columns(panel_content, equal=True, expand=True)),
-            title="Gemini Batch Job Monitor",
-            border_style="blue"
-        )
+import inspect
+import signal
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from gembatch.batch_info import COMPLETED_STATES, batch_to_dict, get_result_path
+from gembatch.job_store import JobInfoWatcher, open_job_manager
+from gembatch.shard import assemble_shard_results, group_shard_jobs
+from gembatch.cache import merge_cached_results
+from gembatch.index import build_index
+from gembatch.inline import write_inline_results
+from gembatch.scheduler import PollScheduler, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL, parse_timestamp
+from gembatch.events import EventLog, open_event_log
+from gembatch.filelock import FileLock
+from gembatch.client import RateLimitedClient, error_code
+from gembatch.metrics import JOB_DURATION_BUCKETS, SnapshotWriter, metrics, serve_metrics
+from gembatch.profiling import span
+
+DEFAULT_WORKERS = 16  # Maximum concurrent status checks per poll cycle
+DOWNLOAD_WORKERS = 4  # Background workers downloading results of completed jobs
+REFRESH_MODES = ['auto', 'get', 'list']  # By job count, per-job batches.get or one batches.list sweep
+LIST_PAGE_SIZE = 100  # Batch jobs per page in a batches.list sweep
+AUTO_LIST_THRESHOLD = 50  # Due jobs above which 'auto' refreshes with a batches.list sweep
+RENDER_INTERVAL = 1.0  # Minimum seconds between screen updates
+WATCH_INTERVAL = 1.0  # Seconds between job info change checks in daemon mode
+DISPLAY_NAMES = ['console', 'to_local_time', 'JobStatusDisplay', 'create_job_status_display']
 
 
-def create_job_status_display(jobs, last_update, countdown=None):
-    """Create a table display for job status (legacy function)"""
-    display = JobStatusDisplay(jobs, last_update)
-    if countdown is not None:
-        display.update_countdown(countdown)
-    return display
+def __getattr__(name):
+    """Keep the display helpers importable from poll without loading rich on import"""
+    if name in DISPLAY_NAMES:
+        from gembatch import display
+        return getattr(display, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_pending_jobs(jobs):
@@ -191,159 +49,484 @@ def get_pending_jobs(jobs):
     pending = []
     for job in jobs:
         batch_state = job['batch'].get('state', '')
-        if batch_state not in ['JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED']:
+        if batch_state not in COMPLETED_STATES:
             pending.append(job)
     return pending
 
 
 def cleanup_job_resources(client, job):
-    """Clean up job and file resources"""
+    """Clean up job and file resources, return messages of failed deletions"""
+    errors = []
+    
     # Delete source file if it exists
     uploaded_file_name = job.get('uploaded_file_name')
     if uploaded_file_name:
         try:
             client.files.delete(name=uploaded_file_name)
-        except Exception:
-            # Ignore errors (might already be deleted)
-            pass
+        except Exception as e:
+            # Resources that are already deleted are not errors
+            if error_code(e) != 404:
+                errors.append(f"{uploaded_file_name}: {e}")
     
     # Delete batch job
     job_name = job['batch']['name']
     try:
         client.batches.delete(name=job_name)
+    except Exception as e:
+        if error_code(e) != 404:
+            errors.append(f"{job_name}: {e}")
+    return errors
+
+
+def download_to_stream(client, file_name, stream):
+    """Write a remote file to a binary stream in chunks"""
+    if 'destination' in inspect.signature(client.files.download).parameters:
+        client.files.download(file=file_name, destination=stream)
+    else:
+        # SDK releases without streaming support return the whole content
+        stream.write(client.files.download(file=file_name))
+
+
+def index_results(result_file):
+    """Build the key index of a result file; lookups rebuild it if this fails"""
+    try:
+        build_index(result_file)
     except Exception:
-        # Ignore errors (might already be deleted)
         pass
 
 
 def download_job_results(client, job):
     """Download job results"""
     try:
-        job_name = job['batch']['name']
+        # Use the batch information refreshed in this poll cycle, fetching
+        # it again only when the destination is not known yet; inline
+        # responses are only part of the full batch object
+        batch = job['batch']
+        batch_job = None
+        if job.get('inline') or not batch.get('dest', {}).get('file_name'):
+            batch_job = client.batches.get(name=batch['name'])
+            batch = batch_to_dict(batch_job)
         
-        # Get latest job status
-        batch_job = client.batches.get(name=job_name)
-        
-        if batch_job.state.name != "JOB_STATE_SUCCEEDED":
-            return False, f"Job not successful: {batch_job.state.name}"
-        
-        # Download result file
-        result_file_name = batch_job.dest.file_name
-        file_content_bytes = client.files.download(file=result_file_name)
-        file_content = file_content_bytes.decode("utf-8")
+        if batch['state'] != "JOB_STATE_SUCCEEDED":
+            return False, f"Job not successful: {batch['state']}"
         
         # Determine download destination (results/ under batch directory)
-        input_path = Path(job['input_file'])
-        results_dir = input_path.parent / "results"
-        results_dir.mkdir(exist_ok=True)
-        
-        # Use input_path.name for filename
-        output_file = results_dir / input_path.name
+        output_file = get_result_path(job['input_file'])
+        output_file.parent.mkdir(exist_ok=True)
         
-        # Save results
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(file_content)
+        # Stream result file into a temporary file next to the destination
+        # so that memory stays bounded and readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=output_file.parent, prefix=f".{output_file.name}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if job.get('inline'):
+                    write_inline_results(batch_job, job['input_file'], f)
+                else:
+                    download_to_stream(client, batch['dest']['file_name'], f)
+            os.replace(tmp_path, output_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
+        index_results(output_file)
         return True, str(output_file)
         
     except Exception as e:
         return False, f"Failed to download results: {e}"
 
 
-def poll_jobs(job_info_file, client):
-    """Poll jobs and process completed ones"""
-    with Live(console=console, auto_refresh=False) as live:
-        while True:
-            # Load latest job information at loop start
-            with AtomicJobManager(job_info_file, client) as manager:
-                jobs = manager.get_all_jobs()
-            
-            if not jobs:
-                live.update(Text("Error: No jobs found", style="red bold"))
-                live.refresh()
-                break
-            
-            # Get incomplete jobs
-            pending_jobs = get_pending_jobs(jobs)
-            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Update display
-            live.update(create_job_status_display(jobs, current_time))
-            live.refresh()
-            
-            # Exit loop if all jobs are completed
-            if not pending_jobs:
+def fetch_batch_states(client, jobs, max_workers=DEFAULT_WORKERS):
+    """Fetch latest batch information for jobs concurrently
+
+    Returns a dict mapping batch name to a batch dict, or to the exception
+    raised while fetching it.
+    """
+    def fetch(job_name):
+        return batch_to_dict(client.batches.get(name=job_name))
+
+    results = {}
+    if not jobs:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        futures = {executor.submit(fetch, job['batch']['name']): job['batch']['name'] for job in jobs}
+        for future in as_completed(futures):
+            job_name = futures[future]
+            try:
+                results[job_name] = future.result()
+            except Exception as e:
+                results[job_name] = e
+    return results
+
+
+def list_batch_states(client, jobs, page_size=LIST_PAGE_SIZE):
+    """Fetch batch information for jobs with one paginated batches.list sweep
+
+    Returns a dict mapping batch name to a batch dict for every job found in
+    the listing. Paging stops as soon as all requested jobs have been seen.
+    """
+    wanted = {job['batch']['name'] for job in jobs}
+    results = {}
+    if not wanted:
+        return results
+    for batch_job in client.batches.list(config={"page_size": page_size}):
+        if batch_job.name in wanted:
+            results[batch_job.name] = batch_to_dict(batch_job)
+            if len(results) == len(wanted):
                 break
-            
-            # Check status of each incomplete job
-            newly_completed = 0
-            
-            for i, job in enumerate(jobs):
-                job_name = job['batch']['name']
-                batch_state = job['batch'].get('state', '')
+    return results
+
+
+def finalize_job(client, job, events=None):
+    """Download results of a completed job and clean up its resources"""
+    events = events or EventLog()
+    job_name = job['batch']['name']
+    if job['batch'].get('state') == "JOB_STATE_SUCCEEDED":
+        start_time = time.monotonic()
+        with span("download", job=job_name):
+            success, detail = download_job_results(client, job)
+        if success:
+            metrics.inc("gembatch_downloaded_bytes_total", os.path.getsize(detail))
+            events.emit("download", job=job_name, input_file=job['input_file'], ok=True,
+                        result_file=detail, bytes=os.path.getsize(detail),
+                        duration=round(time.monotonic() - start_time, 3))
+        else:
+            events.emit("download", job=job_name, input_file=job['input_file'], ok=False,
+                        error=detail, duration=round(time.monotonic() - start_time, 3))
+    
+    # Clean up resources regardless of success/failure
+    start_time = time.monotonic()
+    with span("cleanup", job=job_name):
+        errors = cleanup_job_resources(client, job)
+    events.emit("cleanup", job=job_name, input_file=job['input_file'], ok=not errors,
+                errors=errors, duration=round(time.monotonic() - start_time, 3))
+
+
+def record_completion(job):
+    """Count a job that reached a terminal state and its queue-to-finish time"""
+    batch = job['batch']
+    metrics.inc("gembatch_jobs_completed_total", state=batch.get('state'))
+    if batch.get('state') == "JOB_STATE_SUCCEEDED":
+        metrics.inc("gembatch_requests_completed_total", job.get('count', 0))
+    created = parse_timestamp(batch.get('create_time'))
+    ended = parse_timestamp(batch.get('end_time'))
+    if created is not None and ended is not None:
+        metrics.observe("gembatch_job_duration_seconds", ended - created, buckets=JOB_DURATION_BUCKETS)
+
+
+def refresh_jobs(client, jobs, max_workers=DEFAULT_WORKERS, refresh_mode='get', events=None):
+    """Refresh all pending jobs in one pass, return newly completed jobs
+
+    In 'auto' mode, more than AUTO_LIST_THRESHOLD pending jobs are
+    refreshed with a batches.list sweep, fewer with one batches.get each.
+    Newly completed jobs still need to be finalized with finalize_job.
+    """
+    events = events or EventLog()
+    start_time = time.monotonic()
+    pending_jobs = get_pending_jobs(jobs)
+    if refresh_mode == 'auto':
+        # A page lists up to LIST_PAGE_SIZE jobs, while the get budget
+        # checks 10 jobs per second by default
+        refresh_mode = 'list' if len(pending_jobs) > AUTO_LIST_THRESHOLD else 'get'
+    
+    states = {}
+    if refresh_mode == 'list':
+        try:
+            states = list_batch_states(client, pending_jobs)
+        except Exception as e:
+            # Fall back to per-job requests for this cycle
+            events.emit("error", operation="list", error=str(e))
+            states = {}
+    
+    # Jobs missing from the listing (or all jobs in 'get' mode) are fetched individually
+    missing = [job for job in pending_jobs if job['batch']['name'] not in states]
+    states.update(fetch_batch_states(client, missing, max_workers))
+    
+    newly_completed = []
+    errors = 0
+    for job in pending_jobs:
+        batch = states.get(job['batch']['name'])
+        if batch is None or isinstance(batch, Exception):
+            # Errors are for internal processing only, don't affect display
+            errors += 1
+            if isinstance(batch, Exception):
+                events.emit("error", job=job['batch']['name'], input_file=job['input_file'], error=str(batch))
+            continue
+        
+        # Update job with new batch information
+        previous_state = job['batch'].get('state')
+        job['batch'] = batch
+        if batch.get('state') != previous_state:
+            created = parse_timestamp(batch.get('create_time'))
+            events.emit("state", job=batch['name'], input_file=job['input_file'],
+                        previous=previous_state, state=batch.get('state'),
+                        age=round(time.time() - created, 3) if created is not None else None)
+        if batch.get('state') in COMPLETED_STATES:
+            record_completion(job)
+            newly_completed.append(job)
+    
+    events.emit("refresh", mode=refresh_mode, checked=len(pending_jobs), errors=errors,
+                completed=len(newly_completed), duration=round(time.monotonic() - start_time, 3))
+    return newly_completed
+
+
+def collect_finalized_jobs(finalizing, events=None):
+    """Remove jobs whose background finalization is done, return them"""
+    events = events or EventLog()
+    finished = []
+    for job_name, (job, future) in list(finalizing.items()):
+        if future.done():
+            del finalizing[job_name]
+            try:
+                future.result()
+            except Exception as e:
+                # Errors are for internal processing only, don't affect display
+                events.emit("error", job=job_name, input_file=job['input_file'], operation="finalize",
+                            error=str(e))
+            finished.append(job)
+    return finished
+
+
+def poll_jobs(job_info_file, client, max_workers=DEFAULT_WORKERS, refresh_mode='auto',
+              min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+              download_workers=DOWNLOAD_WORKERS, max_rows=None, render_interval=RENDER_INTERVAL,
+              headless=False, events=None, daemon=False):
+    """Poll jobs and process completed ones
+    
+    In headless mode nothing is rendered; progress is only reported through
+    the event log. Job information is kept in memory and reread only when
+    the job info store changes. In daemon mode polling does not end when all
+    jobs are done: the store is checked for new submissions every
+    WATCH_INTERVAL, which costs a stat call per file while idle.
+    """
+    events = events or EventLog()
+    if headless:
+        display = None
+        live_context = nullcontext()
+    else:
+        # The TUI is only loaded once polling actually starts
+        from rich.live import Live
+        from gembatch.display import JobStatusDisplay, console
+        
+        # One display for the whole session keeps its row cache between cycles
+        display = JobStatusDisplay(max_rows=max_rows, render_interval=render_interval)
+        live_context = Live(console=console, auto_refresh=False)
+    
+    scheduler = PollScheduler(min_interval, max_interval)
+    watcher = JobInfoWatcher(job_info_file, client)
+    idle = False
+    downloader = ThreadPoolExecutor(max_workers=max(1, download_workers))
+    finalizing = {}  # batch name -> (completed job, download/cleanup future)
+    start_time = time.monotonic()
+    events.emit("start", job_info=job_info_file, refresh_mode=refresh_mode, daemon=daemon)
+    try:
+        with live_context as live:
+            while True:
+                # Record jobs whose results were downloaded in the background;
+                # they stay pending in job-info until then, so an interrupted
+                # download is retried by the next poll
+                finished = collect_finalized_jobs(finalizing, events)
+                if finished:
+                    with open_job_manager(job_info_file, client) as manager:
+                        manager.bulk_update_jobs(finished)
+                    for job in finished:
+                        events.emit("recorded", job=job['batch']['name'], input_file=job['input_file'],
+                                    state=job['batch'].get('state'))
                 
-                # Skip if already completed
-                if batch_state in ['JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED']:
-                    continue
+                # Bring job information up to date at loop start; only
+                # records appended since the last cycle are read when possible
+                reload = watcher.refresh()
+                if reload:
+                    events.emit("reload", mode=reload, jobs=len(watcher.jobs))
+                jobs = watcher.get_all_jobs()
                 
-                # Show checking status for this specific job
-                display = JobStatusDisplay(jobs, current_time, checking_job_index=i)
-                live.update(display)
-                live.refresh()
+                if not jobs and not daemon:
+                    events.emit("error", error="No jobs found")
+                    if display:
+                        from rich.text import Text
+                        live.update(Text("Error: No jobs found", style="red bold"))
+                        live.refresh()
+                    else:
+                        print("Error: No jobs found", file=sys.stderr)
+                    break
+                
+                # Reassemble results of sharded inputs once all shards are done
+                for parent_file, shard_jobs in group_shard_jobs(jobs).items():
+                    try:
+                        assembled = assemble_shard_results(parent_file, shard_jobs)
+                        if assembled:
+                            index_results(assembled)
+                            events.emit("assembled", input_file=parent_file, result_file=str(assembled),
+                                        shards=len(shard_jobs))
+                    except Exception as e:
+                        # Retried on the next cycle
+                        events.emit("error", input_file=parent_file, operation="assemble", error=str(e))
+                
+                # Merge cached responses once the reduced input has results
+                cache_infos = {job['cache']['input_file']: job['cache'] for job in jobs if job.get('cache')}
+                for cache_info in cache_infos.values():
+                    try:
+                        merged = merge_cached_results(cache_info)
+                        if merged:
+                            index_results(merged)
+                            events.emit("merged", input_file=cache_info['input_file'], result_file=str(merged))
+                    except Exception as e:
+                        # Retried on the next cycle
+                        events.emit("error", input_file=cache_info['input_file'], operation="merge",
+                                    error=str(e))
+                
+                # Show jobs being finalized with their refreshed state
+                for job in jobs:
+                    if job['batch']['name'] in finalizing:
+                        job['batch'] = finalizing[job['batch']['name']][0]['batch']
+                
+                # Get incomplete jobs
+                pending_jobs = watcher.get_pending_jobs()
+                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                all_done = not pending_jobs and not finalizing
                 
-                try:
-                    batch_job = client.batches.get(name=job_name)
-                    current_state = batch_job.state.name
+                # Update display; the final state is always shown
+                if display:
+                    display.update(jobs, current_time, downloading=len(finalizing))
+                    display.refresh(live, force=all_done)
+                
+                # Exit loop if all jobs are completed and recorded; a daemon
+                # waits for new submissions instead
+                if all_done:
+                    if not daemon:
+                        events.emit("done", jobs=len(jobs), duration=round(time.monotonic() - start_time, 3))
+                        break
+                    if not idle:
+                        events.emit("idle", jobs=len(jobs))
+                    idle = True
+                else:
+                    idle = False
+                
+                # New jobs are checked immediately, others when their backoff expires
+                scheduler.sync(pending_jobs)
+                due_names = set(scheduler.pop_due())
+                due_jobs = [job for job in pending_jobs if job['batch']['name'] in due_names]
+                
+                if due_jobs:
+                    # Show checking status for all due jobs at once
+                    if display:
+                        display.set_checking(due_names)
+                        display.refresh(live)
                     
-                    # Update job with new batch information
-                    job['batch'] = batch_to_dict(batch_job)
+                    # Check status of due jobs concurrently
+                    with span("check", jobs=len(due_jobs)):
+                        newly_completed = refresh_jobs(client, due_jobs, max_workers, refresh_mode, events)
+                    for job in get_pending_jobs(due_jobs):
+                        scheduler.reschedule(job)
                     
-                    if current_state != "JOB_STATE_PENDING":
-                        # Job completed (success, failure, or cancellation)
-                        if current_state == "JOB_STATE_SUCCEEDED":
-                            # Download results
-                            success, message = download_job_results(client, job)
-                            # Download result is for internal processing only
-                        
-                        # Clean up resources regardless of success/failure
-                        cleanup_job_resources(client, job)
-                        newly_completed += 1
-                        
-                        # Update this specific job immediately when state changes
-                        with AtomicJobManager(job_info_file, client) as manager:
-                            manager.update_job_by_batch_name(job)
+                    # Download and clean up in the background while polling continues
+                    for job in newly_completed:
+                        future = downloader.submit(finalize_job, client, job, events)
+                        finalizing[job['batch']['name']] = (job, future)
                     
-                except Exception as e:
-                    # Errors are for internal processing only, don't affect display
-                    pass
-            
-            if newly_completed > 0:
-                # Reload job information and continue to next loop
-                continue
-            
-            # Wait if there are still incomplete jobs
-            remaining = len(get_pending_jobs(jobs))
-            if remaining > 0:
-                # Create display object once
-                display = JobStatusDisplay(jobs, current_time)
-                for countdown in range(POLL_INTERVAL, -1, -5):
-                    display.update_countdown(countdown)
-                    live.update(display)
-                    live.refresh()
-                    if countdown > 0:
-                        time.sleep(5)
+                    if newly_completed:
+                        continue
+                
+                # Sleep until the next job is due or a download finishes, but
+                # check job information at least every min_interval to pick
+                # up newly submitted jobs; a daemon checks for changes every
+                # WATCH_INTERVAL and otherwise sleeps until something is due
+                next_due = scheduler.next_due()
+                wake_at = math.inf if daemon else time.time() + min_interval
+                if next_due is not None:
+                    wake_at = min(next_due, wake_at)
+                if display:
+                    display.update(jobs, current_time, downloading=len(finalizing))
+                futures = [future for _, future in finalizing.values()]
+                # Without a display there is no countdown to update
+                tick = 5 if display else min_interval
+                if daemon:
+                    tick = min(tick, WATCH_INTERVAL)
+                while True:
+                    now = time.time()
+                    if display:
+                        if next_due is not None:
+                            display.update_countdown(max(math.ceil(next_due - now), 0))
+                        display.refresh(live)
+                    if now >= wake_at or (daemon and watcher.changed()):
+                        break
+                    if futures:
+                        done, _ = wait(futures, timeout=min(tick, wake_at - now), return_when=FIRST_COMPLETED)
+                        if done:
+                            break
+                    else:
+                        time.sleep(min(tick, wake_at - now))
+    finally:
+        downloader.shutdown(wait=False, cancel_futures=True)
+        watcher.close()
+
+
+def get_daemon_lock_path(job_info_file):
+    """Lock file held by the poll daemon of a job info store"""
+    return f"{job_info_file}.daemon.lock"
+
+
+def raise_interrupt(signum, frame):
+    """Stop polling on SIGTERM the same way as on Ctrl-C"""
+    raise KeyboardInterrupt
 
 
 def main_with_args(args, client):
     """Main function that accepts parsed arguments and initialized client"""
+    events_path = args.events
+    if args.headless and events_path is None:
+        events_path = '-'
+    if events_path == '-' and not args.headless:
+        print("Error: --events - requires --headless, since the TUI uses standard output", file=sys.stderr)
+        sys.exit(1)
+    # Keep standard output clean for the event stream
+    message_file = sys.stderr if args.headless else sys.stdout
+    
+    # One daemon per job info store; ordinary polls are not affected
+    daemon_lock = None
+    if args.daemon:
+        daemon_lock = FileLock(get_daemon_lock_path(args.job_info), timeout=0)
+        try:
+            daemon_lock.acquire()
+        except TimeoutError:
+            print(f"Error: A poll daemon is already running for {args.job_info} "
+                  f"({daemon_lock.describe_owner()})", file=sys.stderr)
+            sys.exit(1)
+        signal.signal(signal.SIGTERM, raise_interrupt)
+    
+    # Metrics are exposed while polling and written once more at the end
+    snapshot_writer = SnapshotWriter(args.metrics_file).start() if args.metrics_file else None
+    metrics_server = None
+    if args.metrics_port is not None:
+        try:
+            metrics_server = serve_metrics(args.metrics_port)
+        except OSError as e:
+            print(f"Error: Cannot serve metrics on port {args.metrics_port}: {e}", file=sys.stderr)
+            sys.exit(1)
     
     # Poll jobs
+    events = open_event_log(events_path)
+    if isinstance(client, RateLimitedClient):
+        # API retries are reported in the same event stream
+        client.events = events
     try:
-        poll_jobs(args.job_info, client)
-        print("\nPolling completed")
+        poll_jobs(args.job_info, client, args.workers, args.refresh,
+                  args.min_interval, args.max_interval, args.download_workers,
+                  args.rows, args.render_interval, args.headless, events, args.daemon)
+        print("\nPolling completed", file=message_file)
     except KeyboardInterrupt:
-        print("\nPolling interrupted")
+        events.emit("interrupted")
+        print("\nPolling interrupted", file=message_file)
         sys.exit(1)
     except Exception as e:
+        events.emit("error", error=str(e))
         print(f"\nError: Unexpected error during polling: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        events.close()
+        if snapshot_writer is not None:
+            snapshot_writer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if daemon_lock is not None:
+            daemon_lock.release()
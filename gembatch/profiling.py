@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Phase timing spans and cProfile dumps for the global --profile options
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+NO_SPAN = nullcontext()  # Shared span returned while profiling is disabled
+_tracer = None  # Active Tracer, or None when profiling is disabled
+
+
+class Tracer:
+    """Thread-safe recorder of timing spans in the Chrome trace event format
+
+    Spans become complete ("X") events with microsecond timestamps, one
+    track per thread, so the file opens in Perfetto, chrome://tracing or
+    speedscope.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    @contextmanager
+    def span(self, name, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            with self.lock:
+                self.events.append(event)
+
+    def write(self, path):
+        """Write the recorded spans with thread names as a trace file"""
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self.lock:
+            events = list(self.events)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                     "args": {"name": threads.get(tid, f"thread-{tid}")}}
+                    for tid in sorted({event["tid"] for event in events})]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+
+def span(name, **args):
+    """Time a phase as a context manager; a no-op unless profiling is enabled"""
+    if _tracer is None:
+        return NO_SPAN
+    return _tracer.span(name, args)
+
+
+@contextmanager
+def profile_session(trace_file=None, cprofile_file=None):
+    """Record spans to trace_file and a cProfile of the calling thread to cprofile_file
+
+    Both files are written when the session ends, also on errors and
+    sys.exit. Without either file nothing is enabled.
+    """
+    global _tracer
+    profiler = None
+    if trace_file:
+        _tracer = Tracer()
+    if cprofile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_file)
+        if _tracer is not None:
+            tracer, _tracer = _tracer, None
+            tracer.write(trace_file)
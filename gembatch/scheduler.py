@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-job poll scheduling for batch jobs
+"""
+
+import heapq
+import math
+import time
+from datetime import datetime
+
+MIN_POLL_INTERVAL = 30  # Shortest gap between two checks of the same job
+MAX_POLL_INTERVAL = 600  # Longest gap between two checks of the same job
+
+
+def parse_timestamp(iso_time_str):
+    """Convert ISO time string to POSIX timestamp, return None if unavailable"""
+    if not iso_time_str:
+        return None
+    try:
+        return datetime.fromisoformat(iso_time_str.replace('Z', '+00:00')).timestamp()
+    except Exception:
+        return None
+
+
+def next_check_delay(job, now, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+    """Seconds until the next status check of a pending job
+
+    Checks follow an exponential backoff anchored at the job's create_time:
+    the job is due at create_time + base * 2**k, where base grows with the
+    logarithm of the job's line count. The delay is kept between min_interval
+    and max_interval.
+    """
+    count = max(job.get('count', 0), 1)
+    base = min_interval * (1 + math.log10(count))
+
+    created = parse_timestamp(job['batch'].get('create_time'))
+    if created is None:
+        delay = base
+    else:
+        age = max(now - created, 0)
+        if age < base:
+            delay = base - age
+        else:
+            # First backoff point strictly after the current age
+            k = math.floor(math.log2(age / base)) + 1
+            delay = base * 2 ** k - age
+
+    return min(max(delay, min_interval), max_interval)
+
+
+class PollScheduler:
+    """Priority queue of next-check times for pending jobs"""
+
+    def __init__(self, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self._heap = []
+        self._due = {}
+
+    def __len__(self):
+        return len(self._due)
+
+    def _push(self, batch_name, due):
+        self._due[batch_name] = due
+        heapq.heappush(self._heap, (due, batch_name))
+
+    def sync(self, pending_jobs, now=None):
+        """Schedule newly seen jobs for an immediate check and forget finished ones"""
+        now = time.time() if now is None else now
+        names = {job['batch']['name'] for job in pending_jobs}
+        for batch_name in list(self._due):
+            if batch_name not in names:
+                # Heap entries of forgotten jobs are skipped lazily
+                del self._due[batch_name]
+        for batch_name in names:
+            if batch_name not in self._due:
+                self._push(batch_name, now)
+
+    def reschedule(self, job, now=None):
+        """Schedule the next check of a job that is still pending"""
+        now = time.time() if now is None else now
+        delay = next_check_delay(job, now, self.min_interval, self.max_interval)
+        self._push(job['batch']['name'], now + delay)
+
+    def pop_due(self, now=None):
+        """Remove and return names of all jobs whose check is due"""
+        now = time.time() if now is None else now
+        due_names = []
+        while self._heap and self._heap[0][0] <= now:
+            due, batch_name = heapq.heappop(self._heap)
+            if self._due.get(batch_name) == due:
+                del self._due[batch_name]
+                due_names.append(batch_name)
+        return due_names
+
+    def next_due(self):
+        """Return the earliest scheduled check time, or None if nothing is scheduled"""
+        while self._heap:
+            due, batch_name = self._heap[0]
+            if self._due.get(batch_name) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Split large JSONL inputs into shards and reassemble their results
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from gembatch.batch_info import get_result_path
+
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(value):
+    """Parse a byte size such as 500000, 200M or 1G"""
+    text = value.strip().upper().removesuffix("B")
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def get_shard_dir(input_file):
+    """Directory holding the shards of an input file"""
+    input_path = Path(input_file)
+    return input_path.parent / f"{input_path.name}.shards"
+
+
+def shard_file(input_file, max_lines=None, max_bytes=None):
+    """Split a JSONL file into shards, return list of shard file paths
+
+    The file is streamed line by line, so memory usage does not depend on
+    its size. A new shard starts whenever adding the next line would exceed
+    max_lines or max_bytes. Empty lines are dropped. Sharding is
+    deterministic, so splitting the same file again yields the same shards.
+    """
+    input_path = Path(input_file)
+    shard_dir = get_shard_dir(input_file)
+    shard_dir.mkdir(exist_ok=True)
+
+    shard_paths = []
+    out = None
+    lines = size = 0
+    try:
+        with open(input_path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                if out is not None and ((max_lines and lines >= max_lines) or
+                                        (max_bytes and size + len(line) > max_bytes)):
+                    out.close()
+                    out = None
+                if out is None:
+                    shard_path = shard_dir / f"{input_path.stem}-{len(shard_paths) + 1:05d}{input_path.suffix}"
+                    shard_paths.append(str(shard_path))
+                    out = open(shard_path, "wb")
+                    lines = size = 0
+                out.write(line)
+                lines += 1
+                size += len(line)
+    finally:
+        if out is not None:
+            out.close()
+    return shard_paths
+
+
+def needs_sharding(input_file, max_lines=None, max_bytes=None):
+    """Check whether an input file exceeds the shard limits"""
+    if max_bytes and os.path.getsize(input_file) > max_bytes:
+        return True
+    if max_lines:
+        with open(input_file, "rb") as f:
+            lines = 0
+            for line in f:
+                if line.strip():
+                    lines += 1
+                    if lines > max_lines:
+                        return True
+    return False
+
+
+def group_shard_jobs(jobs):
+    """Group shard jobs by their parent input file"""
+    groups = {}
+    for job in jobs:
+        parent_file = job.get('parent_file')
+        if parent_file:
+            groups.setdefault(parent_file, []).append(job)
+    return groups
+
+
+def assemble_shard_results(parent_file, shard_jobs):
+    """Concatenate shard results into the parent's result file in shard order
+
+    Returns the result path, or None if not all shards have succeeded and
+    been downloaded yet. Existing results are left untouched.
+    """
+    output_file = get_result_path(parent_file)
+    if output_file.exists():
+        return None
+    shard_jobs = sorted(shard_jobs, key=lambda job: job['shard_index'])
+    if len(shard_jobs) != shard_jobs[0]['shard_count']:
+        return None
+    shard_results = [get_result_path(job['input_file']) for job in shard_jobs]
+    for job, shard_result in zip(shard_jobs, shard_results):
+        if job['batch'].get('state') != "JOB_STATE_SUCCEEDED" or not shard_result.exists():
+            return None
+
+    output_file.parent.mkdir(exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_file.parent, prefix=f".{output_file.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for shard_result in shard_results:
+                with open(shard_result, "rb") as f:
+                    shutil.copyfileobj(f, out)
+                    # Keep shard boundaries on separate lines
+                    if f.tell() > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            out.write(b"\n")
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_file
@@ -2,99 +2,268 @@
 """
 Submit JSONL files as Gemini batch jobs
 """
+import os
 import sys
-import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from google import genai
-from google.genai import types
-from gembatch.batch_info import batch_to_dict, count_lines, AtomicJobManager
+from gembatch.batch_info import batch_to_dict, count_lines
+from gembatch.job_store import open_job_manager
+from gembatch.shard import get_shard_dir, needs_sharding, shard_file
+from gembatch.cache import ResultCache, merge_cached_results, reduce_with_cache
+from gembatch.index import build_index
+from gembatch.validate import report_errors, validate_file
+from gembatch.inline import load_inline_requests
+from gembatch.metrics import metrics
+from gembatch.profiling import span
 
+DEFAULT_WORKERS = 4  # Concurrent uploads and batch creations
 
-def submit_batch_job(input_file, client, manager, model_id):
-    """Submit a single file as a batch job"""
-    # Check if file exists
-    if not manager.file_exists(input_file):
-        print(f"Error: Input file not found: {input_file}", file=sys.stderr)
-        return False
-    
-    # Check if job already exists
-    existing_job = manager.find_job_by_input_file(input_file)
-    if existing_job:
-        batch_name = existing_job['batch']['name']
-        print(f"Skip: {input_file} already submitted (job: {batch_name})")
-        return True
-    
-    print(f"Uploading file: {input_file}")
+
+def delete_submitted_resources(client, uploaded_file=None, batch_job=None):
+    """Delete the batch job and uploaded file of a submission that is not recorded"""
     try:
-        uploaded_file = client.files.upload(
-            file=str(Path(input_file)),
-            config=types.UploadFileConfig(
-                display_name=input_file,
-                mime_type="jsonl"
+        if batch_job is not None:
+            print(f"Deleting batch job: {batch_job.name}")
+            client.batches.delete(name=batch_job.name)
+        if uploaded_file is not None:
+            print(f"Deleting uploaded file: {uploaded_file.name}")
+            client.files.delete(name=uploaded_file.name)
+        print("Deletion completed")
+    except Exception as delete_error:
+        print(f"Deletion failed: {delete_error}", file=sys.stderr)
+
+
+def submit_batch_job(input_file, client, job_info_file, model_id, extra_fields=None, count=None,
+                     inline_bytes=None):
+    """Submit a single file as a batch job and record it in job-info
+
+    The job-info lock is only held while recording the created job, so
+    uploads of other files and concurrent polling are never blocked.
+    extra_fields are stored in the job record (e.g. shard information),
+    and count is the request count when already known from validation.
+    Files of at most inline_bytes are sent as inline requests, which saves
+    the upload and the deletion of the uploaded file.
+    """
+    uploaded_file = None
+    batch_job = None
+    try:
+        inline_requests = load_inline_requests(input_file, inline_bytes)
+        if inline_requests is not None:
+            print(f"Creating batch job with {len(inline_requests)} inline requests: {input_file}")
+            src = inline_requests
+        else:
+            print(f"Uploading file: {input_file}")
+            uploaded_file = client.files.upload(
+                file=str(Path(input_file)),
+                config={
+                    "display_name": input_file,
+                    "mime_type": "jsonl",
+                }
             )
-        )
-        print(f"Upload completed: {uploaded_file.name}")
-        
-        print(f"Creating batch job...")
+            print(f"Upload completed: {input_file} -> {uploaded_file.name}")
+            metrics.inc("gembatch_uploaded_bytes_total", os.path.getsize(input_file))
+            
+            print(f"Creating batch job: {input_file}")
+            src = uploaded_file.name
         batch_job = client.batches.create(
             model=model_id,
-            src=uploaded_file.name,
+            src=src,
             config={
                 "display_name": input_file,
             }
         )
         
-        print(f"Batch job created successfully: {batch_job.name}")
+        print(f"Batch job created successfully: {input_file} -> {batch_job.name}")
         
         # Record job information in new format
         job_record = {
             "input_file": input_file,
-            "count": count_lines(input_file),
-            "uploaded_file_name": uploaded_file.name,
+            "count": count if count is not None else count_lines(input_file),
+            "uploaded_file_name": uploaded_file.name if uploaded_file is not None else "",
             "batch": batch_to_dict(batch_job)
         }
+        if inline_requests is not None:
+            # Responses are part of the batch job instead of a result file
+            job_record["inline"] = True
+        if extra_fields:
+            job_record.update(extra_fields)
+        
+        # Record job as soon as it is created (atomically saved on context exit)
+        with open_job_manager(job_info_file, client) as manager:
+            success = manager.add_job(job_record)
         
-        # Add job to manager (atomically saved on context exit)
-        success = manager.add_job(job_record)
-        if success:
-            print(f"Job info will be saved")
+        if not success:
+            # Another process submitted the same file in the meantime
+            print(f"Skip: {input_file} was submitted concurrently, discarding duplicate job")
+            delete_submitted_resources(client, uploaded_file, batch_job)
+            return True
         
+        print(f"Job info saved: {input_file}")
         return True
         
     except Exception as e:
         print(f"Error: Failed to process {input_file}: {e}", file=sys.stderr)
         
-        # Try to delete uploaded file if it exists
-        try:
-            if 'uploaded_file' in locals():
-                print(f"Deleting uploaded file: {uploaded_file.name}")
-                client.files.delete(name=uploaded_file.name)
-                print("Deletion completed")
-        except Exception as delete_error:
-            print(f"Deletion failed: {delete_error}", file=sys.stderr)
+        # Try to delete the uploaded file and batch job if they exist
+        if uploaded_file is not None or batch_job is not None:
+            delete_submitted_resources(client, uploaded_file, batch_job)
         
         return False
 
 
+def plan_shards(input_file, args, recorded_files):
+    """Split an input file into shards if requested, return (shard file, extra fields) pairs
+
+    Returns None when the file is submitted as a whole.
+    """
+    if not (args.shard_lines or args.shard_bytes):
+        return None
+    if not needs_sharding(input_file, args.shard_lines, args.shard_bytes):
+        return None
+    
+    shard_files = shard_file(input_file, args.shard_lines, args.shard_bytes)
+    print(f"Sharded: {input_file} -> {len(shard_files)} shards in {get_shard_dir(input_file)}")
+    tasks = []
+    for i, shard in enumerate(shard_files):
+        if shard in recorded_files:
+            print(f"Skip: {shard} already submitted")
+            continue
+        extra_fields = {"parent_file": input_file, "shard_index": i, "shard_count": len(shard_files)}
+        tasks.append((shard, extra_fields))
+    return tasks
+
+
+def apply_cache(input_file, args, cache):
+    """Replace cached requests of an input file, return (file to submit, extra fields)
+
+    Returns (None, None) when every request was answered from the cache and
+    the results have been written directly.
+    """
+    reduced = reduce_with_cache(input_file, args.model, cache)
+    if reduced is None:
+        print(f"Cache: {input_file} has missing or duplicate keys, submitting without cache")
+        return input_file, None
+    reduced_file, hits, misses = reduced
+    print(f"Cache: {input_file} -> {hits} hits, {misses} misses")
+    cache_info = {
+        "dir": str(cache.cache_dir),
+        "max_bytes": cache.max_bytes,
+        "model": args.model,
+        "input_file": input_file,
+        "reduced_file": reduced_file,
+    }
+    if misses == 0:
+        merged = merge_cached_results(cache_info)
+        if merged:
+            build_index(merged)
+        print(f"All requests of {input_file} served from cache")
+        return None, None
+    return reduced_file, {"cache": cache_info}
+
+
 def main_with_args(args, client):
     """Main function that accepts parsed arguments and initialized client"""
     
-    # Process all files under a single lock to prevent race conditions
-    with AtomicJobManager(args.job_info, client) as manager:
+    # Preserve argument order while dropping repeated files
+    input_files = list(dict.fromkeys(args.input_files))
+    total_count = len(input_files)
+    success_count = 0
+    
+    # Check existing jobs under a brief lock; jobs are recorded one by one
+    # as they are created, so the lock is never held during uploads
+    candidates = []
+    with open_job_manager(args.job_info, client) as manager:
         existing_count = len(manager.get_all_jobs())
         print(f"Existing jobs: {existing_count}")
+        recorded_files = {job['input_file'] for job in manager.get_all_jobs()}
+        cached_inputs = {job['cache']['input_file'] for job in manager.get_all_jobs() if job.get('cache')}
         
-        # Process each file
-        success_count = 0
-        total_count = len(args.input_files)
-        
-        for input_file in args.input_files:
-            print(f"\n[{success_count + 1}/{total_count}] Processing: {input_file}")
-            if submit_batch_job(input_file, client, manager, args.model):
+        for input_file in input_files:
+            # Check if file exists
+            if not manager.file_exists(input_file):
+                print(f"Error: Input file not found: {input_file}", file=sys.stderr)
+                continue
+            
+            # Check if job already exists
+            existing_job = manager.find_job_by_input_file(input_file)
+            if existing_job:
+                batch_name = existing_job['batch']['name']
+                print(f"Skip: {input_file} already submitted (job: {batch_name})")
                 success_count += 1
+                continue
+            if input_file in cached_inputs:
+                print(f"Skip: {input_file} already submitted with cache")
+                success_count += 1
+                continue
+            
+            candidates.append(input_file)
+    
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    
+    # Drop cached requests and split oversized inputs outside the lock;
+    # the reduced input is sharded, and each shard becomes its own job
+    to_submit = []  # (input file, file to submit, extra job fields)
+    counts = {}  # Request counts known from validation
+    for input_file in candidates:
+        # Catch malformed lines before anything is uploaded
+        if args.validate:
+            try:
+                with span("validate", input_file=input_file):
+                    result = validate_file(input_file)
+            except Exception as e:
+                print(f"Error: Failed to validate {input_file}: {e}", file=sys.stderr)
+                continue
+            if not result.ok:
+                report_errors(input_file, result)
+                continue
+            print(f"Validated: {input_file} ({result.count} requests)")
+            counts[input_file] = result.count
         
-        print(f"\nCompleted: {success_count}/{total_count} jobs submitted")
-        # All changes will be saved atomically when exiting this context
+        submit_file, cache_fields = input_file, None
+        if cache is not None:
+            try:
+                submit_file, cache_fields = apply_cache(input_file, args, cache)
+            except Exception as e:
+                print(f"Error: Failed to apply cache to {input_file}: {e}", file=sys.stderr)
+                continue
+            if submit_file is None:
+                success_count += 1
+                continue
+        try:
+            tasks = plan_shards(submit_file, args, recorded_files)
+        except Exception as e:
+            print(f"Error: Failed to shard {input_file}: {e}", file=sys.stderr)
+            continue
+        if tasks is None:
+            to_submit.append((input_file, submit_file, cache_fields))
+        elif not tasks:
+            print(f"Skip: {input_file} already submitted as shards")
+            success_count += 1
+        else:
+            for shard, extra_fields in tasks:
+                to_submit.append((input_file, shard, {**extra_fields, **(cache_fields or {})}))
+    
+    # Upload files and create batch jobs concurrently
+    if to_submit:
+        failed_files = set()
+        workers = max(1, min(args.workers, len(to_submit)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for i, (input_file, submit_file, extra_fields) in enumerate(to_submit, 1):
+                print(f"\n[{i}/{len(to_submit)}] Processing: {submit_file}")
+                future = executor.submit(submit_batch_job, submit_file, client, args.job_info,
+                                         args.model, extra_fields, counts.get(submit_file), args.inline_bytes)
+                futures.append((input_file, future))
+            for input_file, future in futures:
+                if not future.result():
+                    failed_files.add(input_file)
+        success_count += len({input_file for input_file, _, _ in to_submit} - failed_files)
+    
+    print(f"\nCompleted: {success_count}/{total_count} jobs submitted")
+    for line in metrics.summary():
+        print(line)
         
     if success_count < total_count:
         sys.exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Validate JSONL batch inputs in a single pass before submission
+"""
+
+import json
+import mmap
+import os
+import sys
+from functools import partial
+
+CHUNK_SIZE = 32 * 1024 * 1024  # Bytes validated per worker task
+PARALLEL_THRESHOLD = 8 * CHUNK_SIZE  # Smaller files are validated in-process
+MAX_ERRORS = 20  # Errors reported per file
+
+
+class ValidationResult:
+    """Outcome of validating an input file"""
+
+    def __init__(self, count=0, errors=None, error_count=0):
+        self.count = count  # Number of request lines
+        self.errors = errors or []  # (line number, message), at most MAX_ERRORS
+        self.error_count = error_count  # Total number of problems found
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+
+def check_generation_config(config):
+    """Return an error message for an invalid generation config, or None"""
+    if not isinstance(config, dict):
+        return "generation config must be an object"
+    # Imported here so that files without generation configs never pay for it
+    from google.genai import types
+    from pydantic import ValidationError
+    try:
+        types.GenerationConfig.model_validate(config)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        return f"invalid generation config at {location}: {error['msg']}"
+    return None
+
+
+def check_request_line(line):
+    """Validate one input line, return (key, error message or None)"""
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        return None, f"invalid JSON: {e}"
+    if not isinstance(data, dict):
+        return None, "line is not a JSON object"
+
+    key = data.get("key")
+    if not isinstance(key, str) or not key:
+        return None, "missing or non-string \"key\""
+    request = data.get("request")
+    if not isinstance(request, dict):
+        return key, "missing \"request\" object"
+    contents = request.get("contents")
+    if not isinstance(contents, list) or not contents:
+        return key, "\"request.contents\" must be a non-empty list"
+
+    for name in ("generation_config", "generationConfig"):
+        if name in request:
+            error = check_generation_config(request[name])
+            if error:
+                return key, error
+    return key, None
+
+
+def validate_chunk(path, start, end, return_keys=False):
+    """Validate the lines of a byte range that starts and ends at line boundaries
+
+    Line numbers in the returned errors and duplicates are relative to the
+    chunk. Repeated keys are returned as (line, key, first line) duplicates.
+    With return_keys, keys are instead returned as a plain list in line
+    order and not checked, which is cheap in a worker process and to send
+    back. Returns (physical lines, request count, errors, error count,
+    duplicates, keys).
+    """
+    errors = []
+    error_count = 0
+    first_lines = {}  # key -> line
+    duplicates = []
+    keys = []
+    count = 0
+    lines = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = start
+        while position < end:
+            newline = data.find(b"\n", position, end)
+            line_end = end if newline < 0 else newline + 1
+            line = data[position:line_end]
+            position = line_end
+            lines += 1
+            if not line.strip():
+                continue
+            count += 1
+            key, error = check_request_line(line)
+            if return_keys:
+                if key is not None:
+                    keys.append(key)
+            elif key is not None:
+                first_line = first_lines.setdefault(key, lines)
+                if first_line != lines:
+                    duplicates.append((lines, key, first_line))
+            if error:
+                error_count += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append((lines, error))
+    return lines, count, errors, error_count, duplicates, keys
+
+
+def split_chunks(path, size, chunk_size=CHUNK_SIZE):
+    """Split a file into byte ranges ending at line boundaries"""
+    chunks = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                newline = data.find(b"\n", end - 1)
+                end = size if newline < 0 else newline + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def validate_file(path, workers=None):
+    """Validate an input file, return a ValidationResult
+
+    Every line is parsed once; large files are split into chunks that are
+    validated by worker processes. Besides per-line checks, keys repeated
+    anywhere in the file are reported with the lines of both occurrences;
+    a chunked file with repeated keys is checked again in-process for them.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return ValidationResult()
+
+    chunks = split_chunks(path, size)
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if size < PARALLEL_THRESHOLD or workers == 1:
+        # In-process validation needs no chunks
+        chunk_results = [validate_chunk(path, 0, size)]
+    else:
+        # Worker processes are only set up for files large enough to use them
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(partial(validate_chunk, return_keys=True), [path] * len(chunks),
+                                              *zip(*chunks)))
+        # Repeated keys are found with set operations on the keys of all
+        # chunks. They are rare, since such files are invalid, and the file is
+        # then checked again in-process to report the lines
+        distinct = set()
+        for *_, keys in chunk_results:
+            distinct.update(keys)
+        if len(distinct) != sum(len(keys) for *_, keys in chunk_results):
+            chunk_results = [validate_chunk(path, 0, size)]
+
+    result = ValidationResult()
+    line_offset = 0
+    for lines, count, errors, error_count, duplicates, _ in chunk_results:
+        result.count += count
+        result.error_count += error_count + len(duplicates)
+        result.errors.extend((line_offset + line, message) for line, message in errors)
+        result.errors.extend((line_offset + line, f"duplicate key {key!r} (first on line {line_offset + first_line})")
+                             for line, key, first_line in duplicates)
+        line_offset += lines
+
+    result.errors.sort()
+    del result.errors[MAX_ERRORS:]
+    return result
+
+
+def report_errors(path, result, file=None):
+    """Print validation errors with line numbers"""
+    file = file or sys.stderr
+    print(f"Error: {path} has {result.error_count} problems (invalid lines and duplicate keys):", file=file)
+    for line, message in result.errors:
+        print(f"  {path}:{line}: {message}", file=file)
+    if result.error_count > len(result.errors):
+        print(f"  ... and {result.error_count - len(result.errors)} more", file=file)